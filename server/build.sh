@@ -4,6 +4,8 @@ set -o errexit
 
 pip install -r requirements.txt
 
+python manage.py check --deploy --fail-level ERROR
+
 python manage.py collectstatic --no-input
 
 python manage.py migrate
@@ -3,6 +3,12 @@ ASGI config for bukaflex project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+/api/orders/stream/ is only served from here; under WSGI it answers 501.
+Run it with an ASGI server, e.g. ``uvicorn bukaflex.asgi:application`` or
+gunicorn with ``-k uvicorn.workers.UvicornWorker``, either for the whole
+site or behind a proxy that routes just that path here. Order changes made
+by WSGI workers and background jobs reach it via ORDER_STREAM_TRANSPORT.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -2,6 +2,8 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .database import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,9 +39,25 @@ INSTALLED_APPS = [
 
 AUTH_USER_MODEL = 'core.User'
 
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.IdCursorPagination',
+    'PAGE_SIZE': int(os.getenv("API_PAGE_SIZE", "50")),
+    # Reverse proxies in front of the app. Anonymous clients are throttled by
+    # IP, and X-Forwarded-For is only trusted for this many hops; with 0 it is
+    # ignored and REMOTE_ADDR is used.
+    'NUM_PROXIES': int(os.getenv("NUM_PROXIES", "0")),
+}
+
+# Largest number of orders accepted by a single POST to /api/orders/batch/.
+ORDER_BATCH_MAX_SIZE = int(os.getenv("ORDER_BATCH_MAX_SIZE", "100"))
+# Seconds a /api/orders/quote/ token can be used to create orders at its prices.
+ORDER_QUOTE_TTL = int(os.getenv("ORDER_QUOTE_TTL", "300"))
+
 MIDDLEWARE = [
+    'core.instrumentation.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.db_routers.ReplicaPinningMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -71,13 +89,155 @@ WSGI_APPLICATION = 'bukaflex.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+DATABASE_CONN_MAX_AGE = int(os.getenv("DATABASE_CONN_MAX_AGE", "60"))
+DATABASE_POOL = os.getenv("DATABASE_POOL", "False") == "True"
+DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+
+
+def _database(url):
+    return database_config(url, DATABASE_CONN_MAX_AGE, DATABASE_POOL, DATABASE_POOL_MAX_SIZE)
+
+
 DATABASES = {
+    'default': _database(os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}")),
+}
+
+# Comma-separated read replica URLs. For a local stand-in, point a second
+# sqlite URL at a copy of db.sqlite3.
+DATABASE_REPLICAS = []
+for _index, _url in enumerate(filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(",")), start=1):
+    DATABASES[f'replica_{_index}'] = dict(_database(_url.strip()), TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS.append(f'replica_{_index}')
+
+DATABASE_ROUTERS = ['core.db_routers.PrimaryReplicaRouter']
+# Models whose reads may be served by a replica when the request is not pinned.
+REPLICA_READ_MODELS = ['core.menuitem', 'core.restaurantprofile', 'core.review', 'core.restaurantratingsummary']
+# Seconds after a write during which that client's reads stay on the primary.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", "5"))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The local-memory default is for development and tests only: each worker
+# would keep its own menus. `manage.py check --deploy` rejects it when DEBUG
+# is off; point CACHE_BACKEND/CACHE_LOCATION at Redis or Memcached instead.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.getenv("CACHE_BACKEND", 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv("CACHE_LOCATION", 'bukaflex'),
     }
 }
 
+MENU_CACHE_ALIAS = 'default'
+# Seconds a built menu stays cached; invalidation normally retires it sooner.
+MENU_CACHE_TIMEOUT = int(os.getenv("MENU_CACHE_TIMEOUT", "3600"))
+# Seconds the rebuild lock is held before another request may take over.
+MENU_CACHE_LOCK_TIMEOUT = 10
+# Seconds a request waits for another request's rebuild before building itself.
+MENU_CACHE_LOCK_WAIT = 2
+
+
+# Opening hours
+
+# Timezone for operating_hours that do not name one.
+RESTAURANT_TIME_ZONE = os.getenv("RESTAURANT_TIME_ZONE", "Africa/Lagos")
+
+
+# Rider dispatch
+
+# Orders further than this from a rider are never offered to them.
+DISPATCH_MAX_DISTANCE_KM = float(os.getenv("DISPATCH_MAX_DISTANCE_KM", "10"))
+# Minutes added to a rider's cost for every delivery they already carry.
+DISPATCH_LOAD_PENALTY_MINUTES = 10
+DISPATCH_VEHICLE_SPEED_KMH = {'bicycle': 12, 'motorcycle': 25, 'car': 20}
+DISPATCH_VEHICLE_CAPACITY = {'bicycle': 1, 'motorcycle': 2, 'car': 3}
+DISPATCH_DEFAULT_VEHICLE_TYPE = 'motorcycle'
+
+
+# Rider tracking (core.tracking)
+
+# Points kept in memory per rider; older ones live only in RiderLocation.
+RIDER_LOCATION_HISTORY = 32
+# Largest number of points accepted by a single POST to /api/riders/locations/.
+RIDER_LOCATION_BATCH_MAX = int(os.getenv("RIDER_LOCATION_BATCH_MAX", "500"))
+# Seconds between bulk writes of queued points; 0 writes after every batch.
+RIDER_LOCATION_FLUSH_SECONDS = float(os.getenv("RIDER_LOCATION_FLUSH_SECONDS", "5"))
+# Queued points kept while writes fall behind before the oldest are dropped.
+RIDER_LOCATION_MAX_PENDING = 500_000
+# Seconds a worker remembers which rider an order's customer may follow.
+ORDER_TRACKING_TTL = 30
+
+
+# Order status streaming (/api/orders/stream/)
+
+# Orders with undelivered updates kept per subscriber before the oldest is dropped.
+ORDER_STREAM_MAX_PENDING = 100
+# Seconds of silence before a keepalive comment is sent.
+ORDER_STREAM_KEEPALIVE = 15
+ORDER_STREAM_RETRY_MS = 3000
+# How order events reach the processes holding streams open:
+# core.realtime.PostgresTransport (LISTEN/NOTIFY, shared by every process)
+# or core.realtime.LocalTransport (this process only, for sqlite/dev).
+ORDER_STREAM_TRANSPORT = os.getenv("ORDER_STREAM_TRANSPORT", (
+    "core.realtime.PostgresTransport" if DATABASES['default']['ENGINE'].endswith('postgresql')
+    else "core.realtime.LocalTransport"
+))
+ORDER_STREAM_TRANSPORT_OPTIONS = {}
+
+
+# Performance instrumentation (Server-Timing headers and /metrics)
+
+PERF_INSTRUMENTATION = os.getenv("PERF_INSTRUMENTATION", "True") == "True"
+# Log slow and repeated (N+1) queries with the viewset that issued them.
+PERF_QUERY_LOG = os.getenv("PERF_QUERY_LOG", "False") == "True"
+PERF_SLOW_QUERY_MS = int(os.getenv("PERF_SLOW_QUERY_MS", "100"))
+PERF_REPEATED_QUERY_THRESHOLD = int(os.getenv("PERF_REPEATED_QUERY_THRESHOLD", "5"))
+# When set, /metrics requires "Authorization: Bearer <token>".
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+# Payments
+
+# Dotted path to a core.payments.PaymentGateway subclass and its keyword arguments.
+# The FakeGateway default approves everything; `check --deploy` rejects it
+# when DEBUG is off.
+PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "core.payments.FakeGateway")
+PAYMENT_GATEWAY_OPTIONS = {}
+# Threads settling payments in the background; 0 settles inline.
+PAYMENT_WORKERS = int(os.getenv("PAYMENT_WORKERS", "4"))
+
+
+# Rate limiting and request coalescing (core.throttling)
+
+# Bucket backend: core.throttling.LocMemStore (per process) or
+# core.throttling.RedisStore, e.g. with {"url": "redis://localhost:6379/0"}.
+THROTTLE_STORE = os.getenv("THROTTLE_STORE", "core.throttling.LocMemStore")
+THROTTLE_STORE_OPTIONS = {"url": os.environ["THROTTLE_REDIS_URL"]} if os.getenv("THROTTLE_REDIS_URL") else {}
+# Route name (as reported by /metrics) -> {"anon"|"user": (refill rate, burst)}.
+# Routes without an entry use "*"; a missing kind is not limited.
+THROTTLE_QUOTAS = {
+    '*': {'anon': ('60/min', 30), 'user': ('600/min', 120)},
+    'menuitem-search': {'anon': ('20/min', 10), 'user': ('120/min', 30)},
+    'restaurantprofile-search': {'user': ('120/min', 30)},
+}
+# Let identical concurrent GETs to coalescing views share one response.
+COALESCE_READS = True
+
+
+# Analytics rollups (python manage.py update_rollups, run every few minutes)
+
+# Changes younger than this are left for the next run, so rows committed
+# late by long transactions are never skipped by the watermark.
+ROLLUP_LAG_SECONDS = int(os.getenv("ROLLUP_LAG_SECONDS", "60"))
+
+
+# Admin
+
+# Changelists count at most this many rows; larger unfiltered PostgreSQL
+# tables show the planner's estimate.
+ADMIN_COUNT_LIMIT = int(os.getenv("ADMIN_COUNT_LIMIT", "10000"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -5,7 +5,8 @@ from django.conf.urls.static import static
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from core.views import UserViewSet, CustomerProfileViewSet, RestaurantProfileViewSet, RiderProfileViewSet, MenuItemViewSet, OrderViewSet, PaymentViewSet, ReviewViewSet, SubscriptionViewSet, AddressViewSet
+from core.instrumentation import metrics
+from core.views import export, order_stream, UserViewSet, CustomerProfileViewSet, RestaurantProfileViewSet, RiderProfileViewSet, MenuItemViewSet, OrderViewSet, PaymentViewSet, ReviewViewSet, SubscriptionViewSet, AddressViewSet
 
 router = DefaultRouter()
 router.register(r'users', UserViewSet)
@@ -21,7 +22,11 @@ router.register(r'addresses', AddressViewSet)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    # Registered ahead of the router so "stream" is not taken as an order id.
+    path('api/orders/stream/', order_stream, name='order-stream'),
+    path('api/exports/<str:name>.<str:fmt>', export, name='export'),
     path('api/', include(router.urls)),
+    path('metrics', metrics, name='metrics'),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
 ]
 
@@ -1,10 +1,131 @@
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR, ChangeList
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+from .exports import FORMATS, stream_export
 from .models import (
     User, CustomerProfile, RestaurantProfile, RiderProfile,
     MenuItem, Order, OrderItem, Payment, Review, Subscription, Address
 )
 
+BEFORE_VAR = 'before'
+AFTER_VAR = 'after'
+
+@admin.action(description='Export selected rows as CSV')
+def export_csv(modeladmin, request, queryset):
+    name = {Order: 'orders', Payment: 'payments'}[queryset.model]
+    response = StreamingHttpResponse(stream_export(name, 'csv', queryset=queryset), content_type=FORMATS['csv'])
+    response['Content-Disposition'] = f'attachment; filename="{name}.csv"'
+    return response
+
+def related(path, description):
+    """A list_display column for ``path`` (e.g. 'customer__user__username'), read from list_select_related joins."""
+    @admin.display(description=description)
+    def column(obj):
+        for attr in path.split('__'):
+            obj = getattr(obj, attr)
+            if obj is None:
+                return None
+        return obj
+    column.__name__ = path
+    return column
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Counts at most ADMIN_COUNT_LIMIT rows. Unfiltered PostgreSQL tables
+    larger than that report the planner's row estimate instead, so no
+    changelist runs a COUNT(*) over a whole large table.
+    """
+    count_prefix = ''
+
+    @cached_property
+    def count(self):
+        queryset, limit = self.object_list, settings.ADMIN_COUNT_LIMIT
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.has_filters():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > limit:
+                self.count_prefix = 'about '
+                return row[0]
+        count = queryset.order_by()[:limit].count()
+        if count == limit:
+            self.count_prefix = 'at least '
+        return count
+
+class KeysetChangeList(ChangeList):
+    """
+    Pages through the default newest-first ordering by primary key:
+    ?before=<pk> shows the next older page and ?after=<pk> the next newer
+    one, so a deep page costs the same as the first. Sorting by a column
+    falls back to numbered pages.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        super().__init__(request, *args, **kwargs)
+        # Filter and sort links start again from the newest rows.
+        for name in (BEFORE_VAR, AFTER_VAR):
+            self.params.pop(name, None)
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        for name in (BEFORE_VAR, AFTER_VAR):
+            params.pop(name, None)
+        return params
+
+    def get_results(self, request):
+        super().get_results(request)
+        before, after = (request.GET.get(name, '') for name in (BEFORE_VAR, AFTER_VAR))
+        # The admin's ordering can appear twice, once from get_queryset().
+        ordering = set(self.queryset.query.order_by)
+        self.keyset = (
+            not self.show_all and PAGE_VAR not in request.GET
+            and bool(ordering) and ordering <= {'-pk', f'-{self.opts.pk.attname}'}
+        )
+        self.newer_url = self.older_url = None
+        if not self.keyset:
+            return
+        # Each page is two queries: its rows, and whether one more page lies
+        # beyond them. The cursor row itself shows there is a page behind.
+        queryset, per_page = self.queryset, self.list_per_page
+        if after.isdigit():
+            ids = list(queryset.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:per_page + 1])
+            page = queryset.filter(pk__in=ids[:per_page])
+            has_newer, has_older = len(ids) > per_page, True
+        else:
+            page = (queryset.filter(pk__lt=before) if before.isdigit() else queryset)[:per_page]
+            has_newer, has_older = before.isdigit(), None
+        rows = list(page)
+        if rows:
+            if has_older is None:
+                has_older = queryset.filter(pk__lt=rows[-1].pk).exists()
+            if has_newer:
+                self.newer_url = self.get_query_string({AFTER_VAR: rows[0].pk})
+            if has_older:
+                self.older_url = self.get_query_string({BEFORE_VAR: rows[-1].pk})
+        self.result_list = page
+        self.multi_page = bool(self.newer_url or self.older_url)
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Bounded-cost changelists for tables that grow with orders: capped or
+    estimated counts, no facet counts, keyset navigation and related
+    columns read through list_select_related.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    ordering = ('-pk',)
+    change_list_template = 'admin/core/keyset_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
+
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'phone_number', 'user_type', 'is_staff')
@@ -18,50 +139,67 @@ class CustomUserAdmin(UserAdmin):
 
 @admin.register(CustomerProfile)
 class CustomerProfileAdmin(admin.ModelAdmin):
-    list_display = ('user', 'default_address')
+    list_display = ('user', related('default_address__street', 'default address'))
+    list_select_related = ('user', 'default_address')
     search_fields = ('user__username', 'user__email')
+    autocomplete_fields = ('user', 'default_address')
 
 @admin.register(RestaurantProfile)
 class RestaurantProfileAdmin(admin.ModelAdmin):
     list_display = ('name', 'cuisine_type', 'is_active')
     list_filter = ('cuisine_type', 'is_active')
     search_fields = ('name', 'description')
+    autocomplete_fields = ('user',)
 
 @admin.register(RiderProfile)
 class RiderProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'vehicle_type', 'license_number', 'is_active')
+    list_select_related = ('user',)
     list_filter = ('vehicle_type', 'is_active')
     search_fields = ('user__username', 'license_number')
+    autocomplete_fields = ('user',)
 
 class MenuItemInline(admin.TabularInline):
     model = MenuItem
     extra = 1
 
 @admin.register(MenuItem)
-class MenuItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'restaurant', 'price', 'category', 'is_available')
-    list_filter = ('restaurant', 'category', 'is_available')
+class MenuItemAdmin(LargeTableAdmin):
+    list_display = ('name', related('restaurant__name', 'restaurant'), 'price', 'category', 'is_available')
+    list_select_related = ('restaurant',)
+    # Filter by restaurant through the search box; a restaurant filter lists every restaurant.
+    list_filter = ('category', 'is_available')
     search_fields = ('name', 'description', 'restaurant__name')
+    autocomplete_fields = ('restaurant',)
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1
     readonly_fields = ('item_price',)
+    autocomplete_fields = ('menu_item',)
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
-    list_display = ('order', 'menu_item', 'quantity', 'item_price')
+class OrderItemAdmin(LargeTableAdmin):
+    list_display = ('id', related('order_id', 'order'), related('menu_item__name', 'menu item'), 'quantity', 'item_price')
+    list_select_related = ('menu_item',)
     list_filter = ('order__status',)
     search_fields = ('order__id', 'menu_item__name')
     readonly_fields = ('item_price',)
-    
+    autocomplete_fields = ('order', 'menu_item')
+
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('id', 'customer', 'restaurant', 'rider', 'status', 'total_amount', 'created_at')
+class OrderAdmin(LargeTableAdmin):
+    list_display = (
+        'id', related('customer__user__username', 'customer'), related('restaurant__name', 'restaurant'),
+        related('rider__user__username', 'rider'), 'status', 'total_amount', 'created_at',
+    )
+    list_select_related = ('customer__user', 'restaurant', 'rider__user')
     list_filter = ('status', 'created_at')
     search_fields = ('customer__user__username', 'restaurant__name', 'rider__user__username')
     readonly_fields = ('created_at', 'updated_at')
+    autocomplete_fields = ('customer', 'restaurant', 'rider')
     inlines = [OrderItemInline]
+    actions = [export_csv]
 
     fieldsets = (
         ('Order Info', {'fields': ('customer', 'restaurant', 'rider', 'status', 'total_amount')}),
@@ -69,32 +207,43 @@ class OrderAdmin(admin.ModelAdmin):
         ('Timestamps', {'fields': ('created_at', 'updated_at')}),
     )
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related('customer', 'restaurant', 'rider')
-
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('order', 'amount', 'payment_method', 'status', 'created_at')
+class PaymentAdmin(LargeTableAdmin):
+    list_display = ('id', related('order_id', 'order'), 'amount', 'payment_method', 'status', 'created_at')
     list_filter = ('status', 'payment_method')
     search_fields = ('order__id', 'transaction_id')
     readonly_fields = ('created_at', 'updated_at')
+    autocomplete_fields = ('order',)
+    actions = [export_csv]
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
-    list_display = ('order', 'customer', 'restaurant', 'rider', 'rating', 'created_at')
+class ReviewAdmin(LargeTableAdmin):
+    list_display = (
+        'id', related('order_id', 'order'), related('customer__user__username', 'customer'),
+        related('restaurant__name', 'restaurant'), related('rider__user__username', 'rider'), 'rating', 'created_at',
+    )
+    list_select_related = ('customer__user', 'restaurant', 'rider__user')
     list_filter = ('rating',)
     search_fields = ('customer__user__username', 'restaurant__name', 'comment')
     readonly_fields = ('created_at',)
+    autocomplete_fields = ('order', 'customer', 'restaurant', 'rider')
 
 @admin.register(Subscription)
-class SubscriptionAdmin(admin.ModelAdmin):
-    list_display = ('customer', 'plan_type', 'start_date', 'end_date', 'status')
+class SubscriptionAdmin(LargeTableAdmin):
+    list_display = (
+        'id', related('customer__user__username', 'customer'), related('restaurant__name', 'restaurant'),
+        'plan_type', 'start_date', 'end_date', 'status',
+    )
+    list_select_related = ('customer__user', 'restaurant')
     list_filter = ('plan_type', 'status')
     search_fields = ('customer__user__username',)
     readonly_fields = ('created_at', 'updated_at')
+    autocomplete_fields = ('customer', 'restaurant')
 
 @admin.register(Address)
 class AddressAdmin(admin.ModelAdmin):
     list_display = ('user', 'street', 'city', 'state', 'country', 'postal_code', 'is_default')
+    list_select_related = ('user',)
     list_filter = ('is_default', 'city', 'state', 'country')
-    search_fields = ('user__username', 'street', 'city')
\ No newline at end of file
+    search_fields = ('user__username', 'street', 'city')
+    autocomplete_fields = ('user',)
@@ -0,0 +1,77 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+MENU_VERSION_KEY = 'menu:{restaurant_id}:version'
+MENU_ENTRY_KEY = 'menu:{restaurant_id}:{version}'
+MENU_LOCK_KEY = 'menu:{restaurant_id}:{version}:lock'
+
+
+def menu_cache():
+    return caches[settings.MENU_CACHE_ALIAS]
+
+
+def _build_menu(restaurant_id):
+    from .models import MenuItem
+    from .readers import reader_for
+    from .serializers import MenuItemSerializer
+
+    # Always read from the primary: a lagging replica would otherwise write a
+    # stale menu under the freshly bumped version.
+    queryset = MenuItem.objects.using('default').filter(restaurant_id=restaurant_id, is_available=True).order_by('-id')
+    return reader_for(MenuItemSerializer).read(queryset)
+
+
+def _menu_version(cache, restaurant_id):
+    key = MENU_VERSION_KEY.format(restaurant_id=restaurant_id)
+    version = cache.get(key)
+    if version is None:
+        # Nothing has been invalidated since the cache came up; start a
+        # version now. add() keeps the first writer's value if several race.
+        cache.add(key, int(time.time()), None)
+        version = cache.get(key)
+    return version
+
+
+def get_menu(restaurant_id):
+    """
+    Return ``(items, version)`` for a restaurant's available menu.
+
+    ``version`` is the unix time the menu last changed and doubles as the
+    ETag and Last-Modified source. On a miss only one caller rebuilds the
+    menu; the others wait up to MENU_CACHE_LOCK_WAIT seconds for its result
+    before falling back to building it themselves.
+    """
+    cache = menu_cache()
+    version = _menu_version(cache, restaurant_id)
+    entry_key = MENU_ENTRY_KEY.format(restaurant_id=restaurant_id, version=version)
+    items = cache.get(entry_key)
+    if items is not None:
+        return items, version
+
+    lock_key = MENU_LOCK_KEY.format(restaurant_id=restaurant_id, version=version)
+    if cache.add(lock_key, 1, settings.MENU_CACHE_LOCK_TIMEOUT):
+        try:
+            items = _build_menu(restaurant_id)
+            cache.set(entry_key, items, settings.MENU_CACHE_TIMEOUT)
+        finally:
+            cache.delete(lock_key)
+        return items, version
+
+    deadline = time.monotonic() + settings.MENU_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.02)
+        items = cache.get(entry_key)
+        if items is not None:
+            return items, version
+    return _build_menu(restaurant_id), version
+
+
+def invalidate_menu(restaurant_id):
+    # Bumping the version orphans the old entry instead of deleting it, so a
+    # rebuild that started before the change can never be served as current.
+    cache = menu_cache()
+    key = MENU_VERSION_KEY.format(restaurant_id=restaurant_id)
+    version = max(int(time.time()), (cache.get(key) or 0) + 1)
+    cache.set(key, version, None)
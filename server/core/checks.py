@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.checks import Error, register
+
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+
+@register('caches', deploy=True)
+def check_menu_cache_is_shared(app_configs, **kwargs):
+    """
+    Menu invalidation bumps a version in the menu cache; with a per-process
+    backend only the worker that saw the write would stop serving the old
+    menu and ETag.
+    """
+    backend = settings.CACHES.get(settings.MENU_CACHE_ALIAS, {}).get('BACKEND')
+    if settings.DEBUG or backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f"The menu cache ({settings.MENU_CACHE_ALIAS!r}) uses {backend}, which each worker process keeps separately.",
+        hint='Set CACHE_BACKEND=django.core.cache.backends.redis.RedisCache and '
+             'CACHE_LOCATION=redis://<host>:6379/1 (redis is in requirements.txt).',
+        id='core.E001',
+    )]
+
+
+@register(deploy=True)
+def check_payment_gateway_is_real(app_configs, **kwargs):
+    """FakeGateway approves every charge; in production that records unpaid orders as revenue."""
+    if settings.DEBUG or settings.PAYMENT_GATEWAY != 'core.payments.FakeGateway':
+        return []
+    return [Error(
+        'PAYMENT_GATEWAY is core.payments.FakeGateway, which marks every payment completed without charging it.',
+        hint='Set PAYMENT_GATEWAY to the dotted path of a real core.payments.PaymentGateway subclass.',
+        id='core.E002',
+    )]
@@ -0,0 +1,139 @@
+from functools import partial
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Q, When
+from django.utils import timezone
+
+from .geo import EARTH_RADIUS_KM
+from .models import Order, OrderEvent, RiderProfile
+from .realtime import order_events_wanted, publish_order_event
+from .tracking import rider_locations
+
+# Statuses during which an order counts against its rider's load.
+IN_FLIGHT_STATUSES = ['ready_for_pickup', 'in_transit']
+
+
+def distance_matrix_km(origins, destinations):
+    """Haversine distances between every (lat, lng) row of origins and destinations."""
+    origins = np.radians(np.asarray(origins, dtype=np.float32))
+    destinations = np.radians(np.asarray(destinations, dtype=np.float32))
+    lat1, lng1 = origins[:, 0:1], origins[:, 1:2]
+    lat2, lng2 = destinations[:, 0], destinations[:, 1]
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return np.float32(2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.minimum(a, np.float32(1.0))))
+
+
+def score_matrix(order_coords, rider_coords, rider_load, rider_speed_kmh, max_distance_km):
+    """
+    Cost in minutes of giving each order to each rider: travel time to the
+    restaurant plus a penalty per delivery the rider already carries. Pairs
+    further apart than max_distance_km cost infinity.
+    """
+    distance = distance_matrix_km(order_coords, rider_coords)
+    cost = distance / np.asarray(rider_speed_kmh, dtype=np.float32) * 60
+    cost += np.asarray(rider_load, dtype=np.float32) * settings.DISPATCH_LOAD_PENALTY_MINUTES
+    cost[distance > max_distance_km] = np.inf
+    return cost
+
+
+def solve_assignment(cost, capacity):
+    """
+    Assign orders (rows) to riders (columns) without exceeding capacity.
+
+    Each round, every unassigned order proposes to its cheapest rider that
+    still has room, all at once; each rider keeps its cheapest proposals up
+    to its remaining capacity. Returns the rider index per order, or -1.
+    """
+    cost = np.array(cost, dtype=np.float32)
+    remaining = np.array(capacity, dtype=np.int64)
+    assignment = np.full(cost.shape[0], -1, dtype=np.int64)
+    if cost.size == 0:
+        return assignment
+    cost[:, remaining <= 0] = np.inf
+
+    while True:
+        pending = np.flatnonzero(assignment == -1)
+        if pending.size == 0:
+            break
+        choice = np.argmin(cost[pending], axis=1)
+        choice_cost = cost[pending, choice]
+        proposing = np.isfinite(choice_cost)
+        if not proposing.any():
+            break
+        pending, choice, choice_cost = pending[proposing], choice[proposing], choice_cost[proposing]
+
+        # Rank proposals within each rider by cost and accept the cheapest.
+        by_rider = np.lexsort((choice_cost, choice))
+        riders_sorted = choice[by_rider]
+        group_start = np.r_[0, np.flatnonzero(np.diff(riders_sorted)) + 1]
+        group_sizes = np.diff(np.r_[group_start, riders_sorted.size])
+        rank = np.arange(riders_sorted.size) - np.repeat(group_start, group_sizes)
+        accepted = by_rider[rank < remaining[riders_sorted]]
+
+        assignment[pending[accepted]] = choice[accepted]
+        np.subtract.at(remaining, choice[accepted], 1)
+        cost[:, remaining <= 0] = np.inf
+    return assignment
+
+
+def dispatch_ready_orders(max_distance_km=None, dry_run=False):
+    """
+    Assign every unassigned ready_for_pickup order to an active rider in one
+    batch. Returns a list of (order_id, rider_id) pairs that were assigned.
+    """
+    max_distance_km = max_distance_km or settings.DISPATCH_MAX_DISTANCE_KM
+    orders = list(
+        Order.objects.filter(status='ready_for_pickup', rider__isnull=True)
+        .exclude(restaurant__latitude=None).exclude(restaurant__longitude=None)
+        .values_list('id', 'restaurant__latitude', 'restaurant__longitude')
+    )
+    riders = list(
+        RiderProfile.objects.filter(is_active=True).exclude(latitude=None).exclude(longitude=None)
+        .annotate(load=Count('deliveries', filter=Q(deliveries__status__in=IN_FLIGHT_STATUSES)))
+        .values_list('id', 'latitude', 'longitude', 'vehicle_type', 'load')
+    )
+    if not orders or not riders:
+        return []
+
+    speeds = settings.DISPATCH_VEHICLE_SPEED_KMH
+    capacities = settings.DISPATCH_VEHICLE_CAPACITY
+    default_type = settings.DISPATCH_DEFAULT_VEHICLE_TYPE
+    order_coords = np.array([(lat, lng) for _, lat, lng in orders], dtype=np.float64)
+    rider_coords = np.array([(lat, lng) for _, lat, lng, _, _ in riders], dtype=np.float64)
+    vehicle = [vehicle_type.lower() if vehicle_type.lower() in speeds else default_type
+               for _, _, _, vehicle_type, _ in riders]
+    load = np.array([row[4] for row in riders], dtype=np.int64)
+    speed = np.array([speeds[v] for v in vehicle], dtype=np.float32)
+    capacity = np.maximum(np.array([capacities[v] for v in vehicle], dtype=np.int64) - load, 0)
+
+    cost = score_matrix(order_coords, rider_coords, load, speed, max_distance_km)
+    assignment = solve_assignment(cost, capacity)
+    pairs = [(orders[i][0], riders[r][0]) for i, r in enumerate(assignment.tolist()) if r >= 0]
+    if dry_run or not pairs:
+        return pairs
+
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(pairs), 500):
+            chunk = dict(pairs[start:start + 500])
+            # Only touch orders still unassigned, so a rider set by hand in
+            # the meantime is never overwritten.
+            Order.objects.filter(pk__in=chunk, status='ready_for_pickup', rider__isnull=True).update(
+                rider_id=Case(*[When(pk=order_id, then=rider_id) for order_id, rider_id in chunk.items()]),
+                updated_at=now,
+            )
+        applied = set(Order.objects.filter(pk__in=[order_id for order_id, _ in pairs]).values_list('pk', 'rider_id'))
+        applied = [pair for pair in pairs if pair in applied]
+        OrderEvent.objects.bulk_create(
+            OrderEvent(order_id=order_id, from_status='ready_for_pickup', to_status='ready_for_pickup', rider_id=rider_id)
+            for order_id, rider_id in applied
+        )
+        # update() skips post_save, so publish to order streams explicitly.
+        if order_events_wanted():
+            for order_id, _ in applied:
+                transaction.on_commit(partial(publish_order_event, order_id))
+        transaction.on_commit(partial(rider_locations.forget_orders, [order_id for order_id, _ in applied]))
+    return applied
+
@@ -0,0 +1,131 @@
+"""
+Streaming CSV and NDJSON exports of orders, order items and payments.
+
+Rows are read with .values_list().iterator(chunk_size), which uses a
+server-side cursor on PostgreSQL and chunked fetches on SQLite, and are
+encoded and yielded in blocks, so memory stays flat however many rows a
+date range covers.
+"""
+import csv
+import json
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.text import compress_sequence
+
+from .models import Order, OrderItem, Payment
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+BLOCK_SIZE = 64 * 1024
+
+# name: (model, date field the range applies to, [(column, lookup), ...])
+EXPORTS = {
+    'orders': (Order, 'created_at', [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('status', 'status'),
+        ('customer_id', 'customer_id'),
+        ('customer', 'customer__user__username'),
+        ('restaurant_id', 'restaurant_id'),
+        ('restaurant', 'restaurant__name'),
+        ('rider_id', 'rider_id'),
+        ('total_amount', 'total_amount'),
+        ('subscription_id', 'subscription_id'),
+        ('scheduled_for', 'scheduled_for'),
+        ('payment_status', 'payment__status'),
+        ('delivery_address', 'delivery_address'),
+    ]),
+    'order-items': (OrderItem, 'order__created_at', [
+        ('id', 'id'),
+        ('order_id', 'order_id'),
+        ('order_created_at', 'order__created_at'),
+        ('order_status', 'order__status'),
+        ('restaurant_id', 'order__restaurant_id'),
+        ('menu_item_id', 'menu_item_id'),
+        ('menu_item', 'menu_item__name'),
+        ('quantity', 'quantity'),
+        ('item_price', 'item_price'),
+    ]),
+    'payments': (Payment, 'created_at', [
+        ('id', 'id'),
+        ('order_id', 'order_id'),
+        ('created_at', 'created_at'),
+        ('updated_at', 'updated_at'),
+        ('amount', 'amount'),
+        ('payment_method', 'payment_method'),
+        ('status', 'status'),
+        ('transaction_id', 'transaction_id'),
+        ('failure_reason', 'failure_reason'),
+        ('restaurant_id', 'order__restaurant_id'),
+    ]),
+}
+
+
+def export_queryset(name, start=None, end=None, status=None, restaurant_id=None, queryset=None):
+    """
+    Rows of an export as a values_list queryset ordered by id. ``start`` and
+    ``end`` are inclusive local dates; ``queryset`` narrows the base rows,
+    e.g. to an admin selection.
+    """
+    model, date_field, columns = EXPORTS[name]
+    queryset = model._default_manager.all() if queryset is None else queryset
+    if start:
+        queryset = queryset.filter(**{f'{date_field}__gte': timezone.make_aware(datetime.combine(start, time.min))})
+    if end:
+        queryset = queryset.filter(**{f'{date_field}__lt': timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))})
+    if status:
+        # Order items have no status of their own; they follow their order's.
+        queryset = queryset.filter(**{'order__status' if model is OrderItem else 'status': status})
+    if restaurant_id:
+        restaurant_field = 'restaurant_id' if model is Order else 'order__restaurant_id'
+        queryset = queryset.filter(**{restaurant_field: restaurant_id})
+    return queryset.order_by('id').values_list(*(lookup for _, lookup in columns))
+
+
+def _cell(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class _Line:
+    """Write target for csv.writer that hands each encoded line back."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_cell(value) for value in row])
+
+
+def ndjson_lines(columns, rows):
+    for row in rows:
+        yield json.dumps({column: _cell(value) for column, value in zip(columns, row)}, default=str) + '\n'
+
+
+def blocks(lines, size=BLOCK_SIZE):
+    """Join lines into byte blocks of about ``size``, so a response is not yielded row by row."""
+    pending, length = [], 0
+    for line in lines:
+        pending.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(pending).encode()
+            pending, length = [], 0
+    if pending:
+        yield ''.join(pending).encode()
+
+
+def stream_export(name, fmt, chunk_size=2000, compress=False, **filters):
+    """Encoded blocks of an export; gzip-compressed as they are produced when ``compress`` is set."""
+    columns = [column for column, _ in EXPORTS[name][2]]
+    rows = export_queryset(name, **filters).iterator(chunk_size=chunk_size)
+    encoded = blocks((csv_lines if fmt == 'csv' else ndjson_lines)(columns, rows))
+    return compress_sequence(encoded) if compress else encoded
@@ -0,0 +1,120 @@
+import math
+
+from django.db.models import Q
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+# Upper bound on the index range scans issued by one nearby search.
+MAX_COVERING_CELLS = 16
+EARTH_RADIUS_KM = 6371.0088
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Return the (lat, lng) size in degrees of a geohash cell."""
+    lng_bits = math.ceil(precision * 5 / 2)
+    lat_bits = precision * 5 - lng_bits
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Return (min_lat, max_lat, min_lng, max_lng) around a search circle."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(min(abs(latitude) + lat_delta, 89.9)))
+    lng_delta = min(math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat)), 180.0)
+    return (max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0),
+            longitude - lng_delta, longitude + lng_delta)
+
+
+def covering_cells(latitude, longitude, radius_km, max_cells=MAX_COVERING_CELLS):
+    """
+    Return the geohash prefixes of every cell overlapping the search circle's
+    bounding box, at the finest precision that needs at most max_cells cells.
+    Each prefix becomes one index range scan.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    precision = GEOHASH_PRECISION
+    while precision > 1:
+        lat_size, lng_size = cell_size(precision)
+        rows = math.floor(max_lat / lat_size) - math.floor(min_lat / lat_size) + 1
+        columns = math.floor(max_lng / lng_size) - math.floor(min_lng / lng_size) + 1
+        if rows * columns <= max_cells:
+            break
+        precision -= 1
+
+    lat_size, lng_size = cell_size(precision)
+    cells = set()
+    lat_steps = math.floor(max_lat / lat_size) - math.floor(min_lat / lat_size)
+    lng_steps = math.floor(max_lng / lng_size) - math.floor(min_lng / lng_size)
+    for row in range(lat_steps + 1):
+        lat = min(min_lat + row * lat_size, max_lat)
+        for column in range(lng_steps + 1):
+            lng = min(min_lng + column * lng_size, max_lng)
+            cells.add(geohash_encode(lat, (lng + 180.0) % 360.0 - 180.0, precision))
+    return sorted(cells)
+
+
+def _prefix_upper_bound(prefix):
+    # Smallest geohash greater than every hash starting with prefix. Staying
+    # inside the alphabet keeps the range valid under non-C collations too.
+    while prefix and prefix[-1] == GEOHASH_ALPHABET[-1]:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + GEOHASH_ALPHABET[GEOHASH_ALPHABET.index(prefix[-1]) + 1]
+
+
+def geohash_prefix_q(prefixes, field='geohash'):
+    """Build an OR of index-friendly range lookups, one per prefix."""
+    condition = Q()
+    for prefix in prefixes:
+        cell = Q(**{f'{field}__gte': prefix})
+        upper = _prefix_upper_bound(prefix)
+        if upper is not None:
+            cell &= Q(**{f'{field}__lt': upper})
+        condition |= cell
+    return condition
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def nearby(queryset, latitude, longitude, radius_km, limit):
+    """
+    Return ``[(restaurant, distance_km), ...]`` within radius_km of a point,
+    closest first. The geohash index narrows the rows fetched to the cells
+    around the point; exact distances are computed in Python.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_km)
+    candidates = queryset.filter(geohash_prefix_q(covering_cells(latitude, longitude, radius_km)))
+    if -180.0 <= min_lng and max_lng <= 180.0:
+        candidates = candidates.filter(latitude__range=(min_lat, max_lat), longitude__range=(min_lng, max_lng))
+    results = []
+    for restaurant in candidates:
+        distance = haversine_km(latitude, longitude, float(restaurant.latitude), float(restaurant.longitude))
+        if distance <= radius_km:
+            results.append((restaurant, distance))
+    results.sort(key=lambda result: result[1])
+    return results[:limit]
@@ -0,0 +1,124 @@
+"""
+Opening hours as indexed UTC minute-of-week intervals.
+
+RestaurantProfile.operating_hours maps day names to local opening times:
+
+    {"mon": "08:00-22:00", "fri": ["08:00-14:00", "17:00-02:00"], "sun": "closed",
+     "timezone": "Africa/Lagos"}
+
+A range ending at or before its start runs past midnight, "24:00" ends a
+day, and days that are missing are closed. The timezone defaults to
+RESTAURANT_TIME_ZONE. Each restaurant's hours are stored as OpeningInterval
+rows of [start, end) minutes since Monday 00:00 UTC, merged and split at
+the week boundary, so "open at minute m" is one range lookup.
+
+The UTC offset is taken when the intervals are computed, so restaurants in
+zones with daylight saving need recompute_opening_intervals after each
+clock change.
+"""
+import re
+from datetime import timezone as dt_timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OpeningInterval
+
+DAYS = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+RANGE = re.compile(r'^([01]\d|2[0-3]):([0-5]\d)-([01]\d|2[0-4]):([0-5]\d)$')
+
+
+def parse_operating_hours(hours):
+    """Validate ``hours`` and return (local [start, end) minute-of-week ranges, tz name). Raises ValueError."""
+    if not isinstance(hours, dict):
+        raise ValueError('Operating hours must be an object keyed by day.')
+    unknown = set(hours) - set(DAYS) - {'timezone'}
+    if unknown:
+        raise ValueError(f"Unknown keys: {', '.join(sorted(unknown))}. Use {', '.join(DAYS)} and timezone.")
+    zone = hours.get('timezone') or settings.RESTAURANT_TIME_ZONE
+    try:
+        ZoneInfo(zone)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        raise ValueError(f'Unknown timezone {zone!r}.')
+
+    ranges = []
+    for index, day in enumerate(DAYS):
+        value = hours.get(day, [])
+        if value == 'closed':
+            value = []
+        if not isinstance(value, (str, list)):
+            raise ValueError(f'{day}: expected a range, a list of ranges or "closed".')
+        for text in [value] if isinstance(value, str) else value:
+            match = RANGE.match(text) if isinstance(text, str) else None
+            if not match or (match[3] == '24' and match[4] != '00'):
+                raise ValueError(f'{day}: expected "HH:MM-HH:MM" ranges or "closed", got {text!r}.')
+            start = int(match[1]) * 60 + int(match[2])
+            end = int(match[3]) * 60 + int(match[4])
+            if end == start:
+                raise ValueError(f'{day}: {text} opens and closes at the same time.')
+            if end < start:
+                end += MINUTES_PER_DAY
+            offset = index * MINUTES_PER_DAY
+            ranges.append((offset + start, offset + end))
+    return ranges, zone
+
+
+def utc_intervals(hours, at=None):
+    """Merged, non-overlapping UTC [start, end) minute-of-week intervals for ``hours``."""
+    ranges, zone = parse_operating_hours(hours)
+    offset = (at or timezone.now()).astimezone(ZoneInfo(zone)).utcoffset()
+    shift = int(offset.total_seconds() // 60)
+    pieces = []
+    for start, end in ranges:
+        start, end = start - shift, end - shift
+        # Wrap into the week, splitting ranges that cross Monday 00:00 UTC.
+        start, end = start % MINUTES_PER_WEEK, start % MINUTES_PER_WEEK + (end - start)
+        if end > MINUTES_PER_WEEK:
+            pieces += [(start, MINUTES_PER_WEEK), (0, end - MINUTES_PER_WEEK)]
+        else:
+            pieces.append((start, end))
+    merged = []
+    for start, end in sorted(pieces):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def minute_of_week(moment=None):
+    moment = (moment or timezone.now()).astimezone(dt_timezone.utc)
+    return moment.weekday() * MINUTES_PER_DAY + moment.hour * 60 + moment.minute
+
+
+def open_at_q(moment=None):
+    """Q for restaurants open at ``moment`` (default now): one range lookup on the interval index."""
+    minute = minute_of_week(moment)
+    return Q(pk__in=OpeningInterval.objects.filter(start__lte=minute, end__gt=minute).values('restaurant_id'))
+
+
+def sync_opening_intervals(restaurants):
+    """
+    Replace the intervals of ``restaurants`` (objects or (id, operating_hours)
+    pairs) in bulk. Restaurants with invalid hours are left closed; their
+    ids are returned.
+    """
+    rows, ids, invalid = [], [], []
+    for restaurant in restaurants:
+        restaurant_id, hours = (restaurant.pk, restaurant.operating_hours) if hasattr(restaurant, 'pk') else restaurant
+        ids.append(restaurant_id)
+        try:
+            intervals = utc_intervals(hours)
+        except ValueError:
+            invalid.append(restaurant_id)
+            continue
+        rows += [OpeningInterval(restaurant_id=restaurant_id, start=start, end=end) for start, end in intervals]
+    with transaction.atomic():
+        OpeningInterval.objects.filter(restaurant_id__in=ids).delete()
+        OpeningInterval.objects.bulk_create(rows)
+    return invalid
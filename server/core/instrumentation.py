@@ -0,0 +1,188 @@
+"""
+Per-request performance instrumentation: database time and query count,
+serializer time, response size and latency, reported in Server-Timing
+headers and aggregated into per-route histograms served at /metrics in
+the Prometheus text format.
+
+Histograms live in the process, so under a multi-process server each
+worker reports its own; scrape them per worker or aggregate upstream.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self, log_queries=False):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.log_queries = log_queries
+        self.statements = Counter()
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_queries += 1
+            self.db_seconds += elapsed
+            if self.log_queries:
+                # Django passes SQL with placeholders, so repeats share a key.
+                self.statements[sql] += 1
+                if elapsed * 1000 >= settings.PERF_SLOW_QUERY_MS:
+                    self.slow.append((elapsed, sql))
+
+
+@contextmanager
+def timed_section(name):
+    """Add the block's duration to ``<name>_seconds`` of the current request, if one is being measured."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, f'{name}_seconds', getattr(stats, f'{name}_seconds') + time.perf_counter() - started)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series = defaultdict(lambda: [[0] * (len(self.buckets) + 1), 0.0])
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series[labels]
+            series[0][index] += 1
+            series[1] += value
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{label_text},le="{le}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {total!r}')
+            lines.append(f'{self.name}_count{{{label_text}}} {cumulative}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+HISTOGRAMS = {
+    'duration': Histogram('bukaflex_request_duration_seconds', 'Total request latency.', LATENCY_BUCKETS),
+    'db_seconds': Histogram('bukaflex_request_db_seconds', 'Time spent in database queries per request.', LATENCY_BUCKETS),
+    'db_queries': Histogram('bukaflex_request_db_queries', 'Database queries per request.', (0, 1, 2, 3, 5, 10, 20, 50, 100)),
+    'serialize_seconds': Histogram('bukaflex_request_serialize_seconds', 'Time spent in serializers per request.', LATENCY_BUCKETS),
+    'response_bytes': Histogram('bukaflex_response_bytes', 'Response body size.', (256, 1024, 4096, 16384, 65536, 262144, 1048576)),
+}
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None and match.view_name else 'unmatched'
+
+
+def viewset_of(request):
+    match = getattr(request, 'resolver_match', None)
+    view_class = getattr(getattr(match, 'func', None), 'cls', None)
+    if view_class is None:
+        return route_of(request)
+    action = getattr(match.func, 'actions', {}).get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class PerformanceMiddleware:
+    """
+    Measure each request and report it in a Server-Timing header and the
+    /metrics histograms. With PERF_QUERY_LOG on, also log slow queries and
+    statements repeated PERF_REPEATED_QUERY_THRESHOLD times in one request
+    (the usual N+1 shape), naming the viewset action responsible.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PERF_INSTRUMENTATION:
+            return self.get_response(request)
+        stats = RequestStats(log_queries=settings.PERF_QUERY_LOG)
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.db_queries} queries"',
+            f'serialize;dur={stats.serialize_seconds * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ])
+        labels = (('method', request.method), ('route', route_of(request)))
+        HISTOGRAMS['duration'].observe(labels, duration)
+        HISTOGRAMS['db_seconds'].observe(labels, stats.db_seconds)
+        HISTOGRAMS['db_queries'].observe(labels, stats.db_queries)
+        HISTOGRAMS['serialize_seconds'].observe(labels, stats.serialize_seconds)
+        if not response.streaming:
+            HISTOGRAMS['response_bytes'].observe(labels, len(response.content))
+        if stats.log_queries:
+            self.report_queries(request, stats)
+        return response
+
+    def report_queries(self, request, stats):
+        view = viewset_of(request)
+        for sql, count in stats.statements.items():
+            if count >= settings.PERF_REPEATED_QUERY_THRESHOLD:
+                logger.warning('Possible N+1 in %s (%s %s): %d executions of %s', view, request.method, request.path, count, sql)
+        for elapsed, sql in stats.slow:
+            logger.warning('Slow query in %s (%s %s): %.1f ms: %s', view, request.method, request.path, elapsed * 1000, sql)
+
+
+def metrics(request):
+    """Prometheus scrape endpoint. Set METRICS_TOKEN to require ``Authorization: Bearer <token>``."""
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=401)
+    lines = []
+    for histogram in HISTOGRAMS.values():
+        lines.extend(histogram.expose())
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,205 @@
+"""
+Concurrent load generator for the /api/ endpoints. Requests are sent
+either in-process through django.test.Client or over HTTP to a running
+server sharing this database, so the same scenarios can profile the
+stack with or without a network and an application server in the way.
+"""
+import json
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.db import connections
+from django.test import Client
+from django.utils import timezone
+
+from .benchmarks import latency_summary
+from .models import CustomerProfile, MenuItem, Order, RestaurantProfile, Review, RiderProfile, Subscription
+from .synthetic import CENTER, SPREAD
+
+SEARCH_TERMS = ['jollof', 'egusi', 'suya', 'chiken', 'pepper soup', 'kitchen', 'plantain', 'amala']
+
+# name: (relative weight, who sends it, path builder)
+SCENARIOS = {
+    'restaurants-list': (10, 'customer', lambda rng, plan, session: '/api/restaurants/'),
+    'restaurants-nearby': (10, 'customer', lambda rng, plan, session: (
+        f'/api/restaurants/nearby/?lat={CENTER[0] + rng.uniform(-SPREAD, SPREAD):.5f}'
+        f'&lng={CENTER[1] + rng.uniform(-SPREAD, SPREAD):.5f}&radius_km=5')),
+    'restaurants-search': (5, 'customer', lambda rng, plan, session: f'/api/restaurants/search/?q={rng.choice(SEARCH_TERMS)}'),
+    'menu-by-restaurant': (20, 'customer', lambda rng, plan, session: f'/api/menu-items/?restaurant_id={rng.choice(plan.restaurants)}'),
+    'menu-search': (10, 'customer', lambda rng, plan, session: f'/api/menu-items/search/?q={rng.choice(SEARCH_TERMS)}'),
+    'orders-list': (15, 'customer', lambda rng, plan, session: '/api/orders/'),
+    'order-detail': (10, 'customer', lambda rng, plan, session: f'/api/orders/{rng.choice(plan.orders[session])}/'),
+    'order-events': (5, 'customer', lambda rng, plan, session: f'/api/orders/{rng.choice(plan.orders[session])}/events/'),
+    'restaurant-orders': (5, 'restaurant_owner', lambda rng, plan, session: '/api/orders/'),
+    'restaurant-stats': (2, 'restaurant_owner', lambda rng, plan, session: f'/api/restaurants/{plan.restaurant_of[session]}/stats/'),
+    'rider-orders': (3, 'rider', lambda rng, plan, session: '/api/orders/'),
+    'reviews-list': (4, 'customer', lambda rng, plan, session: '/api/reviews/'),
+    'subscriptions-list': (2, 'customer', lambda rng, plan, session: '/api/subscriptions/'),
+    'payments-list': (1, 'customer', lambda rng, plan, session: '/api/payments/'),
+}
+
+
+def session_for(user):
+    """Create a logged-in session for ``user`` without a password round trip."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return session.session_key
+
+
+class LoadPlan:
+    """Users (as session keys) and ids the scenarios draw from, sampled from the database."""
+
+    def __init__(self, seed=0, users=50):
+        rng = random.Random(seed)
+        self.restaurants = list(RestaurantProfile.objects.filter(is_active=True).values_list('id', flat=True))
+        customer_orders = defaultdict(list)
+        for customer_id, order_id in Order.objects.values_list('customer_id', 'id'):
+            customer_orders[customer_id].append(order_id)
+        customers = CustomerProfile.objects.filter(pk__in=rng.sample(sorted(customer_orders), min(users, len(customer_orders))))
+        owners = RestaurantProfile.objects.filter(pk__in=rng.sample(self.restaurants, min(users, len(self.restaurants))))
+        riders = RiderProfile.objects.filter(deliveries__isnull=False).distinct().order_by('?')[:users]
+
+        self.sessions = {'customer': [], 'restaurant_owner': [], 'rider': []}
+        self.orders = {}
+        self.restaurant_of = {}
+        for kind, profiles in (('customer', customers), ('restaurant_owner', owners), ('rider', riders)):
+            for profile in profiles.select_related('user'):
+                key = session_for(profile.user)
+                self.sessions[kind].append(key)
+                if kind == 'customer':
+                    self.orders[key] = customer_orders[profile.pk]
+                elif kind == 'restaurant_owner':
+                    self.restaurant_of[key] = profile.pk
+
+    def scenarios(self, names=None):
+        return {
+            name: scenario for name, scenario in SCENARIOS.items()
+            if (names is None or name in names) and self.sessions[scenario[1]] and (name != 'menu-by-restaurant' or self.restaurants)
+        }
+
+
+def in_process_fetcher():
+    local = threading.local()
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+
+    def fetch(path, session_key):
+        if not hasattr(local, 'client'):
+            local.client = Client(HTTP_HOST=host)
+        local.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        response = local.client.get(path)
+        body = b''.join(response) if response.streaming else response.content
+        return response.status_code, len(body)
+
+    return fetch
+
+
+def http_fetcher(base_url, timeout=30):
+    base_url = base_url.rstrip('/')
+
+    def fetch(path, session_key):
+        request = urllib.request.Request(base_url + path, headers={'Cookie': f'{settings.SESSION_COOKIE_NAME}={session_key}'})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as exc:
+            return exc.code, len(exc.read())
+
+    return fetch
+
+
+def run_load(fetch, plan, scenarios, concurrency=8, requests=2000, warmup=50, seed=0):
+    """
+    Send ``requests`` weighted-random requests from ``concurrency`` threads
+    and return per-scenario and overall throughput and latency.
+    """
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+
+    def worker(index, count):
+        rng = random.Random(seed * 1000 + index)
+        samples = []
+        try:
+            for _ in range(count):
+                name = rng.choices(names, weights)[0]
+                _, kind, build = scenarios[name]
+                session_key = rng.choice(plan.sessions[kind])
+                path = build(rng, plan, session_key)
+                start = time.perf_counter()
+                status, size = fetch(path, session_key)
+                samples.append((name, time.perf_counter() - start, status, size))
+        finally:
+            connections.close_all()
+        return samples
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(worker, range(concurrency), [warmup // concurrency] * concurrency))
+        started = time.perf_counter()
+        counts = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+        samples = [sample for result in pool.map(worker, range(concurrency), counts) for sample in result]
+        wall = time.perf_counter() - started
+
+    by_scenario = defaultdict(list)
+    for sample in samples:
+        by_scenario[sample[0]].append(sample)
+    return {
+        'overall': summarize(samples, wall),
+        'scenarios': {name: summarize(by_scenario[name], wall) for name in names if by_scenario[name]},
+    }
+
+
+def summarize(samples, wall):
+    errors = [status for _, _, status, _ in samples if status >= 400]
+    summary = latency_summary([elapsed for _, elapsed, _, _ in samples])
+    summary.update(
+        requests_per_second=round(len(samples) / wall, 1) if wall else 0.0,
+        errors=len(errors),
+        statuses=sorted(set(errors)),
+        mean_bytes=round(sum(size for *_, size in samples) / max(len(samples), 1)),
+    )
+    return summary
+
+
+def dataset_counts():
+    return {model.__name__: model.objects.count()
+            for model in (RestaurantProfile, MenuItem, CustomerProfile, RiderProfile, Order, Review, Subscription)}
+
+
+def git_commit(cwd=None):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=cwd, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def write_results(results, directory):
+    """Save a run as <timestamp>-<commit>.json under ``directory`` and return the path."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{timezone.now():%Y%m%dT%H%M%S}-{results['commit']}.json"
+    path.write_text(json.dumps(results, indent=2))
+    return path
+
+
+def compare(previous, current):
+    """Rows of (scenario, old p95, new p95, p95 change %, old rps, new rps) for scenarios in both runs."""
+    rows = []
+    for name in ['overall', *sorted(current['scenarios'])]:
+        old = previous['overall'] if name == 'overall' else previous['scenarios'].get(name)
+        new = current['overall'] if name == 'overall' else current['scenarios'][name]
+        if old:
+            change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] * 100 if old['p95_ms'] else 0.0
+            rows.append((name, old['p95_ms'], new['p95_ms'], round(change, 1),
+                         old['requests_per_second'], new['requests_per_second']))
+    return rows
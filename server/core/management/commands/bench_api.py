@@ -0,0 +1,62 @@
+import json
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarks import benchmark_database
+from core.loadtest import LoadPlan, compare, dataset_counts, git_commit, http_fetcher, in_process_fetcher, run_load, write_results
+from core.synthetic import DEFAULT_SCALE, SyntheticDataset
+
+
+class Command(BaseCommand):
+    help = ('Drive the main /api/ endpoints with concurrent clients and report throughput and p50/p95/p99. '
+            'By default a synthetic dataset is generated in a throwaway database; results are saved as JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--warmup', type=int, default=100)
+        parser.add_argument('--users', type=int, default=50, help='Distinct logged-in users per role.')
+        parser.add_argument('--scenario', action='append', dest='scenarios', help='Only run these scenarios (repeatable).')
+        parser.add_argument('--scale', type=float, default=0.2, help='Synthetic dataset size, as for generate_synthetic_data.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--existing-data', action='store_true', help='Use the configured database as is instead of a throwaway one.')
+        parser.add_argument('--base-url', help='Send requests over HTTP to a server using this database; implies --existing-data.')
+        parser.add_argument('--output-dir', type=Path, default=settings.BASE_DIR / 'benchmark-results')
+        parser.add_argument('--compare', type=Path, help='Earlier results file to compare p95 and throughput against.')
+
+    def handle(self, *args, **options):
+        existing = options['existing_data'] or options['base_url']
+        with nullcontext() if existing else benchmark_database(on_disk=True):
+            if not existing:
+                scale = {name: max(1, round(count * options['scale'])) for name, count in DEFAULT_SCALE.items()
+                         if name != 'menu_items_per_restaurant'}
+                SyntheticDataset(prefix='bench', seed=options['seed'], **scale).generate()
+            plan = LoadPlan(seed=options['seed'], users=options['users'])
+            scenarios = plan.scenarios(options['scenarios'])
+            if not scenarios:
+                raise CommandError('No runnable scenarios; the database needs customers with orders.')
+            fetch = http_fetcher(options['base_url']) if options['base_url'] else in_process_fetcher()
+            report = run_load(fetch, plan, scenarios, concurrency=options['concurrency'], requests=options['requests'],
+                              warmup=options['warmup'], seed=options['seed'])
+            results = {
+                'commit': git_commit(settings.BASE_DIR),
+                'timestamp': timezone.now().isoformat(),
+                'target': options['base_url'] or 'in-process',
+                'database': connection.vendor,
+                'concurrency': options['concurrency'],
+                'dataset': dataset_counts(),
+                **report,
+            }
+        path = write_results(results, options['output_dir'])
+        self.stdout.write(json.dumps(results, indent=2))
+        self.stdout.write(f'Saved to {path}')
+        if options['compare']:
+            previous = json.loads(options['compare'].read_text())
+            self.stdout.write(f"\nCompared with {previous['commit']} ({previous['timestamp']}):")
+            for name, old_p95, new_p95, change, old_rps, new_rps in compare(previous, results):
+                self.stdout.write(f'{name:<20} p95 {old_p95:>9.2f} -> {new_p95:>9.2f} ms ({change:+.1f}%)   {old_rps:>8.1f} -> {new_rps:>8.1f} req/s')
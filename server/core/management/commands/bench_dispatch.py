@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import latency_summary, timed
+from core.dispatch import score_matrix, solve_assignment
+
+CENTER = (6.5244, 3.3792)
+SPREAD = 0.3
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the dispatch scoring and assignment on synthetic orders and riders.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--riders', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        n_orders, n_riders = options['orders'], options['riders']
+        order_coords = CENTER + rng.uniform(-SPREAD, SPREAD, size=(n_orders, 2))
+        rider_coords = CENTER + rng.uniform(-SPREAD, SPREAD, size=(n_riders, 2))
+        vehicles = rng.choice(list(settings.DISPATCH_VEHICLE_SPEED_KMH), size=n_riders)
+        speed = np.array([settings.DISPATCH_VEHICLE_SPEED_KMH[v] for v in vehicles])
+        capacity = np.array([settings.DISPATCH_VEHICLE_CAPACITY[v] for v in vehicles])
+        load = rng.integers(0, 2, size=n_riders)
+        capacity = np.maximum(capacity - load, 0)
+
+        score_samples, solve_samples = [], []
+        for _ in range(options['repeat']):
+            elapsed, cost = timed(score_matrix, order_coords, rider_coords, load, speed,
+                                  settings.DISPATCH_MAX_DISTANCE_KM)
+            score_samples.append(elapsed)
+            elapsed, assignment = timed(solve_assignment, cost, capacity)
+            solve_samples.append(elapsed)
+
+        self.stdout.write(json.dumps({
+            'orders': n_orders,
+            'riders': n_riders,
+            'assigned': int((assignment >= 0).sum()),
+            'score': latency_summary(score_samples),
+            'solve': latency_summary(solve_samples),
+        }, indent=2))
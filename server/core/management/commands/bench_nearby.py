@@ -0,0 +1,57 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import benchmark_database, latency_summary, timed
+from core.geo import geohash_encode, nearby
+from core.models import RestaurantProfile, User
+
+# Greater Lagos, roughly 110 km across.
+CENTER = (6.5244, 3.3792)
+SPREAD = 0.5
+
+
+class Command(BaseCommand):
+    help = 'Benchmark nearby-restaurant search latency on a throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--radius-km', type=float, default=5.0)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with benchmark_database():
+            self.seed(rng, options['restaurants'])
+            queryset = RestaurantProfile.objects.filter(is_active=True)
+            samples, found = [], 0
+            for _ in range(options['queries']):
+                lat = CENTER[0] + rng.uniform(-SPREAD, SPREAD)
+                lng = CENTER[1] + rng.uniform(-SPREAD, SPREAD)
+                elapsed, results = timed(nearby, queryset, lat, lng, options['radius_km'], 20)
+                samples.append(elapsed)
+                found += len(results)
+        summary = latency_summary(samples)
+        summary.update(restaurants=options['restaurants'], radius_km=options['radius_km'],
+                       mean_results=round(found / max(len(samples), 1), 2))
+        self.stdout.write(json.dumps(summary, indent=2))
+
+    def seed(self, rng, count):
+        batch_size = 5000
+        for start in range(0, count, batch_size):
+            size = min(batch_size, count - start)
+            users = User.objects.bulk_create([
+                User(username=f'bench-restaurant-{start + i}', user_type='restaurant_owner', password='!')
+                for i in range(size)
+            ])
+            restaurants = []
+            for user in users:
+                lat = round(CENTER[0] + rng.uniform(-SPREAD, SPREAD), 8)
+                lng = round(CENTER[1] + rng.uniform(-SPREAD, SPREAD), 8)
+                restaurants.append(RestaurantProfile(
+                    user=user, name=user.username, cuisine_type='Nigerian', address='Lagos',
+                    latitude=lat, longitude=lng, geohash=geohash_encode(lat, lng),
+                ))
+            RestaurantProfile.objects.bulk_create(restaurants)
@@ -0,0 +1,76 @@
+import json
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.benchmarks import benchmark_database, latency_summary, timed
+from core.models import MenuItem, RestaurantProfile, User
+from core.search import get_search_backend
+
+DISHES = ['jollof', 'fried rice', 'egusi', 'ogbono', 'efo riro', 'pounded yam', 'amala', 'suya', 'asun',
+          'moi moi', 'akara', 'puff puff', 'chin chin', 'pepper soup', 'nkwobi', 'ofada', 'banga', 'afang',
+          'edikang ikong', 'boli', 'dodo', 'shawarma', 'burger', 'pizza', 'noodles', 'chapman', 'zobo']
+STYLES = ['party', 'smoky', 'spicy', 'classic', 'special', 'jumbo', 'mini', 'family', 'house', 'native']
+EXTRAS = ['chicken', 'beef', 'goat meat', 'fish', 'turkey', 'plantain', 'salad', 'egg', 'prawns', 'snail']
+CATEGORIES = ['Mains', 'Soups', 'Swallow', 'Grills', 'Snacks', 'Drinks', 'Sides']
+CUISINES = ['Nigerian', 'Ghanaian', 'Continental', 'Grill', 'Fast Food']
+QUERIES = ['jollof', 'jol', 'egusi soup', 'egsui', 'pepper soup goat', 'suya beef', 'smoky jollof chicken',
+           'pounded', 'chapmann', 'plantain', 'ofada', 'nkwobi', 'shawama', 'party rice']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark menu search latency against a throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--menu-items', type=int, default=1_000_000)
+        parser.add_argument('--items-per-restaurant', type=int, default=50)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if get_search_backend() is None:
+            raise CommandError(f'Search is not supported on {connection.vendor}.')
+        rng = random.Random(options['seed'])
+        with benchmark_database():
+            self.seed(rng, options['menu_items'], options['items_per_restaurant'])
+            backend = get_search_backend()
+            plain, filtered = [], []
+            for _ in range(options['queries']):
+                query = rng.choice(QUERIES)
+                plain.append(timed(backend.search_menu_items, query, 20)[0])
+                filtered.append(timed(backend.search_menu_items, query, 20, category=rng.choice(CATEGORIES),
+                                      max_price=Decimal(rng.choice([1500, 3000, 6000])))[0])
+        self.stdout.write(json.dumps({
+            'menu_items': options['menu_items'],
+            'search': latency_summary(plain),
+            'search_with_filters': latency_summary(filtered),
+        }, indent=2))
+
+    def seed(self, rng, count, per_restaurant):
+        restaurants = -(-count // per_restaurant)
+        users = User.objects.bulk_create(
+            [User(username=f'bench-search-{i}', user_type='restaurant_owner', password='!') for i in range(restaurants)],
+            batch_size=5000,
+        )
+        owners = RestaurantProfile.objects.bulk_create(
+            [RestaurantProfile(user=user, name=f'{rng.choice(STYLES).title()} Kitchen {user.pk}',
+                               cuisine_type=rng.choice(CUISINES), address='Lagos') for user in users],
+            batch_size=5000,
+        )
+        batch = []
+        for i in range(count):
+            name = f'{rng.choice(STYLES)} {rng.choice(DISHES)} with {rng.choice(EXTRAS)}'.title()
+            batch.append(MenuItem(
+                restaurant=owners[i // per_restaurant], name=name, category=rng.choice(CATEGORIES),
+                description=f'{rng.choice(DISHES)} served with {rng.choice(EXTRAS)} and {rng.choice(EXTRAS)}',
+                price=Decimal(rng.randrange(500, 8000, 50)),
+            ))
+            if len(batch) == 10_000:
+                MenuItem.objects.bulk_create(batch)
+                batch = []
+        MenuItem.objects.bulk_create(batch)
+        # bulk_create skips the signals that normally maintain the index.
+        with connection.cursor() as cursor:
+            get_search_backend().index_menu_items(cursor)
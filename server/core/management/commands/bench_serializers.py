@@ -0,0 +1,81 @@
+import json
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from core.benchmarks import benchmark_database, timed
+from core.models import CustomerProfile, MenuItem, Order, OrderItem, RestaurantProfile, RestaurantRatingSummary, User
+from core.readers import reader_for
+from core.serializers import MenuItemSerializer, OrderSerializer, RestaurantProfileSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare rows/sec of ModelSerializer and ValuesReader rendering for the list endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20_000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        rows = options['rows']
+        with benchmark_database():
+            self.seed(rng, rows)
+            querysets = {
+                'restaurants': (RestaurantProfileSerializer, RestaurantProfile.objects.select_related('user', 'rating_summary').order_by('-id')),
+                'menu_items': (MenuItemSerializer, MenuItem.objects.order_by('-id')),
+                'orders': (OrderSerializer, Order.objects.prefetch_related('items').order_by('-created_at', '-id')),
+            }
+            renderer = JSONRenderer()
+            results = {}
+            for name, (serializer_class, queryset) in querysets.items():
+                reader = reader_for(serializer_class)
+                before, after = [], []
+                for _ in range(options['repeat']):
+                    elapsed, expected = timed(lambda: renderer.render(serializer_class(queryset[:rows], many=True).data))
+                    before.append(elapsed)
+                    elapsed, actual = timed(lambda: renderer.render(reader.read(queryset[:rows])))
+                    after.append(elapsed)
+                results[name] = {
+                    'rows': rows,
+                    'serializer_rows_per_second': round(rows / min(before)),
+                    'values_reader_rows_per_second': round(rows / min(after)),
+                    'speedup': round(min(before) / min(after), 2),
+                    'identical': expected == actual,
+                }
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def seed(self, rng, count):
+        users = User.objects.bulk_create(
+            [User(username=f'bench-owner-{i}', email=f'owner{i}@example.com', user_type='restaurant_owner', password='!') for i in range(count)],
+            batch_size=5000,
+        )
+        restaurants = RestaurantProfile.objects.bulk_create(
+            [RestaurantProfile(user=user, name=f'Kitchen {user.pk}', cuisine_type='Nigerian', address='Lagos',
+                               latitude=Decimal('6.5244'), longitude=Decimal('3.3792')) for user in users],
+            batch_size=5000,
+        )
+        RestaurantRatingSummary.objects.bulk_create(
+            [RestaurantRatingSummary(restaurant=restaurant, count=2, total=9, rating_4=1, rating_5=1, recent_ratings='45')
+             for restaurant in restaurants[::2]],
+            batch_size=5000,
+        )
+        items = MenuItem.objects.bulk_create(
+            [MenuItem(restaurant=rng.choice(restaurants), name=f'Dish {i}', category='Mains',
+                      price=Decimal(rng.randrange(500, 5000, 50))) for i in range(count)],
+            batch_size=5000,
+        )
+        customer = CustomerProfile.objects.create(user=User.objects.create(username='bench-customer', user_type='customer'))
+        orders = Order.objects.bulk_create(
+            [Order(customer=customer, restaurant=rng.choice(restaurants), total_amount=Decimal('4500.00'),
+                   delivery_address='1 Marina Road') for _ in range(count)],
+            batch_size=5000,
+        )
+        OrderItem.objects.bulk_create(
+            [OrderItem(order=order, menu_item=rng.choice(items), quantity=2, item_price=Decimal('1500.00'))
+             for order in orders for _ in range(3)],
+            batch_size=5000,
+        )
@@ -0,0 +1,79 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import latency_summary
+from core.realtime import OrderBroker
+
+
+class Command(BaseCommand):
+    help = 'Load-test the in-process order stream broker with many concurrent subscribers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscribers', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=5_000)
+        parser.add_argument('--events', type=int, default=20_000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        result = asyncio.run(self.run(options))
+        self.stdout.write(json.dumps(result, indent=2))
+
+    async def run(self, options):
+        rng = random.Random(options['seed'])
+        broker = OrderBroker(max_pending=100)
+        latencies, delivered, last_delivery = [], 0, 0.0
+
+        async def consume(subscription):
+            nonlocal delivered, last_delivery
+            while True:
+                for event in await subscription.next_events():
+                    last_delivery = time.perf_counter()
+                    latencies.append(last_delivery - event['sent'])
+                    delivered += 1
+
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        subscriptions = [broker.subscribe(rng.randrange(options['users'])) for _ in range(options['subscribers'])]
+        consumers = [asyncio.ensure_future(consume(subscription)) for subscription in subscriptions]
+        await asyncio.sleep(0)
+        per_subscriber = sum(
+            stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, 'filename')
+        ) / options['subscribers']
+        tracemalloc.stop()
+
+        # Publish from a worker thread, as request handlers do after commit.
+        def publish_all():
+            for order_id in range(options['events']):
+                users = [rng.randrange(options['users']) for _ in range(3)]
+                broker.publish(users, {'order': order_id, 'status': 'preparing', 'sent': time.perf_counter()})
+
+        start = time.perf_counter()
+        publisher = threading.Thread(target=publish_all)
+        publisher.start()
+        while publisher.is_alive():
+            await asyncio.sleep(0.01)
+        publish_seconds = time.perf_counter() - start
+        # Let consumers drain what is still queued on the loop.
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+        elapsed = max(last_delivery - start, publish_seconds)
+        for consumer in consumers:
+            consumer.cancel()
+        await asyncio.gather(*consumers, return_exceptions=True)
+
+        return {
+            'subscribers': options['subscribers'],
+            'events_published': options['events'],
+            'deliveries': delivered,
+            'publish_per_sec': round(options['events'] / publish_seconds),
+            'deliveries_per_sec': round(delivered / elapsed),
+            'bytes_per_subscriber': round(per_subscriber),
+            'dropped': sum(subscription.dropped for subscription in subscriptions),
+            'delivery_latency': latency_summary(latencies),
+        }
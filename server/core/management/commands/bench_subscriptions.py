@@ -0,0 +1,89 @@
+import json
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import benchmark_database, timed
+from core.models import CustomerProfile, MenuItem, Order, OrderItem, RestaurantProfile, Subscription, SubscriptionItem, User
+from core.scheduler import due_subscriptions, run_scheduler
+
+RUN_DATE = date(2025, 1, 31)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark subscription order generation against a throwaway database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscriptions', type=int, default=500_000)
+        parser.add_argument('--per-customer', type=int, default=5)
+        parser.add_argument('--restaurants', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with benchmark_database(on_disk=options['workers'] > 1):
+            self.seed(rng, options['subscriptions'], options['per_customer'], options['restaurants'])
+            due_seconds, due = timed(due_subscriptions(RUN_DATE).count)
+            elapsed, processed = timed(run_scheduler, RUN_DATE, options['workers'], options['chunk_size'])
+            rerun_seconds, reprocessed = timed(run_scheduler, RUN_DATE, options['workers'], options['chunk_size'])
+            result = {
+                'subscriptions': options['subscriptions'],
+                'due': due,
+                'workers': options['workers'],
+                'due_count_ms': round(due_seconds * 1000, 3),
+                'processed': processed,
+                'orders': Order.objects.count(),
+                'order_items': OrderItem.objects.count(),
+                'seconds': round(elapsed, 3),
+                'subscriptions_per_second': round(processed / elapsed) if elapsed else None,
+                'rerun_processed': reprocessed,
+                'rerun_seconds': round(rerun_seconds, 3),
+            }
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def seed(self, rng, count, per_customer, restaurant_count):
+        owners = User.objects.bulk_create(
+            [User(username=f'bench-sub-owner-{i}', user_type='restaurant_owner', password='!') for i in range(restaurant_count)],
+            batch_size=5000,
+        )
+        restaurants = RestaurantProfile.objects.bulk_create(
+            [RestaurantProfile(user=user, name=f'Kitchen {user.pk}', cuisine_type='Nigerian', address='Lagos') for user in owners],
+        )
+        menus = {}
+        for restaurant in restaurants:
+            menus[restaurant.pk] = MenuItem.objects.bulk_create(
+                [MenuItem(restaurant=restaurant, name=f'Dish {i}', price=Decimal(rng.randrange(500, 5000, 50))) for i in range(10)],
+            )
+
+        customers = -(-count // per_customer)
+        users = User.objects.bulk_create(
+            [User(username=f'bench-sub-customer-{i}', user_type='customer', password='!') for i in range(customers)],
+            batch_size=5000,
+        )
+        profiles = CustomerProfile.objects.bulk_create([CustomerProfile(user=user) for user in users], batch_size=5000)
+
+        plans = ['weekly', 'bi_weekly', 'monthly']
+        subscriptions = []
+        for i in range(count):
+            # A fifth are not due yet and one in fifty is paused.
+            offset = rng.randrange(1, 7) if i % 5 == 0 else -rng.randrange(0, 7)
+            subscriptions.append(Subscription(
+                customer=profiles[i // per_customer], restaurant=rng.choice(restaurants), plan_type=rng.choice(plans),
+                start_date=RUN_DATE - timedelta(days=rng.randrange(0, 60)), next_run_date=RUN_DATE + timedelta(days=offset),
+                delivery_address='12 Admiralty Way, Lekki', status='paused' if i % 50 == 0 else 'active',
+            ))
+            if len(subscriptions) == 10_000:
+                self.seed_items(rng, Subscription.objects.bulk_create(subscriptions), menus)
+                subscriptions = []
+        self.seed_items(rng, Subscription.objects.bulk_create(subscriptions), menus)
+
+    def seed_items(self, rng, subscriptions, menus):
+        SubscriptionItem.objects.bulk_create([
+            SubscriptionItem(subscription=subscription, menu_item=item, quantity=rng.randint(1, 3))
+            for subscription in subscriptions
+            for item in rng.sample(menus[subscription.restaurant_id], 2)
+        ])
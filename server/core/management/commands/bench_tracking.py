@@ -0,0 +1,118 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmarks import benchmark_database, latency_summary, timed
+from core.loadtest import session_for
+from core.models import CustomerProfile, Order, RestaurantProfile, RiderLocation, RiderProfile, User
+from core.tracking import LocationStore, location_flusher, parse_points, rider_locations
+from core.synthetic import CENTER, SPREAD
+
+
+class Command(BaseCommand):
+    help = ('Measure sustained rider location updates per second on one worker: through the in-memory store alone '
+            'and through /api/riders/locations/ with the background flush running, plus customer position reads.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--riders', type=int, default=500)
+        parser.add_argument('--batches', type=int, default=5000, help='Location batches posted to the endpoint.')
+        parser.add_argument('--points', type=int, default=10, help='GPS points per batch.')
+        parser.add_argument('--flush-seconds', type=float, default=1.0)
+        parser.add_argument('--reads', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        with benchmark_database(on_disk=True), override_settings(RIDER_LOCATION_FLUSH_SECONDS=options['flush_seconds']):
+            result = self.run(options)
+        self.stdout.write(json.dumps(result, indent=2))
+
+    def payloads(self, rng, riders, count, points):
+        """(rider index, batch) pairs whose timestamps keep rising for every rider."""
+        clock = time.time() - count * points
+        for _ in range(count):
+            lat, lng = (c + rng.uniform(-SPREAD, SPREAD) for c in CENTER)
+            batch = []
+            for _ in range(points):
+                clock += 1
+                batch.append([lat + rng.uniform(-1e-3, 1e-3), lng + rng.uniform(-1e-3, 1e-3), clock])
+            yield rng.randrange(riders), {'points': batch}
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        n_riders, n_points = options['riders'], options['points']
+        users = User.objects.bulk_create([User(username=f'track-rider-{i}', user_type='rider') for i in range(n_riders)])
+        riders = RiderProfile.objects.bulk_create([
+            RiderProfile(user=user, vehicle_type='motorcycle', license_number=f'LIC-{user.pk}') for user in users
+        ])
+        owner = User.objects.create(username='track-owner', user_type='restaurant_owner')
+        restaurant = RestaurantProfile.objects.create(user=owner, name='Tracking Buka', address='1 Marina',
+                                                      cuisine_type='Nigerian', operating_hours={})
+        customer_user = User.objects.create(username='track-customer', user_type='customer')
+        customer = CustomerProfile.objects.create(user=customer_user)
+        orders = Order.objects.bulk_create([
+            Order(customer=customer, restaurant=restaurant, rider=rider, status='in_transit',
+                  total_amount='1000.00', delivery_address='2 Broad Street')
+            for rider in riders
+        ])
+
+        # The store on its own: parsing plus the ring buffer write.
+        store = LocationStore(max_pending=options['batches'] * n_points)
+        batches = list(self.payloads(rng, n_riders, options['batches'], n_points))
+        store_seconds, _ = timed(lambda: [store.add(riders[i].pk, parse_points(data)) for i, data in batches])
+
+        # The endpoint, one request at a time as a single worker thread serves them.
+        rider_locations.clear()
+        host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        sessions = [session_for(user) for user in users]
+        bodies = [(i, json.dumps(data)) for i, data in self.payloads(rng, n_riders, options['batches'], n_points)]
+        samples, accepted = [], 0
+        start = time.perf_counter()
+        for i, body in bodies:
+            client.cookies[settings.SESSION_COOKIE_NAME] = sessions[i]
+            elapsed, response = timed(client.post, '/api/riders/locations/', body, content_type='application/json')
+            samples.append(elapsed)
+            accepted += response.json()['accepted']
+        endpoint_seconds = time.perf_counter() - start
+        flush_seconds, _ = timed(location_flusher.stop)
+
+        # Customer reads of their order's rider position.
+        client.cookies[settings.SESSION_COOKIE_NAME] = session_for(customer_user)
+        read_samples = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(options['reads']):
+                order = orders[rng.randrange(len(orders))]
+                elapsed, _ = timed(client.get, f'/api/orders/{order.pk}/rider-location/')
+                read_samples.append(elapsed)
+        tracking_queries = sum('core_order' in query['sql'] for query in queries.captured_queries)
+
+        points_total = options['batches'] * n_points
+        return {
+            'riders': n_riders,
+            'batches': options['batches'],
+            'points_per_batch': n_points,
+            'store': {
+                'points_per_sec': round(points_total / store_seconds),
+                'batches_per_sec': round(options['batches'] / store_seconds),
+            },
+            'endpoint': {
+                'points_per_sec': round(points_total / endpoint_seconds),
+                'batches_per_sec': round(options['batches'] / endpoint_seconds),
+                'latency': latency_summary(samples),
+                'accepted': accepted,
+                'dropped': rider_locations.dropped,
+                'history_rows': RiderLocation.objects.count(),
+                'final_flush_ms': round(flush_seconds * 1000, 3),
+            },
+            'reads': {
+                'latency': latency_summary(read_samples),
+                'order_queries': tracking_queries,
+                'distinct_orders': len(orders),
+            },
+        }
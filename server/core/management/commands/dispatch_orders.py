@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.dispatch import dispatch_ready_orders
+
+
+class Command(BaseCommand):
+    help = 'Assign ready_for_pickup orders to active riders in one batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-distance-km', type=float, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='Compute assignments without saving them.')
+
+    def handle(self, *args, **options):
+        pairs = dispatch_ready_orders(max_distance_km=options['max_distance_km'], dry_run=options['dry_run'])
+        verb = 'Would assign' if options['dry_run'] else 'Assigned'
+        self.stdout.write(f'{verb} {len(pairs)} orders.')
+        if options['verbosity'] > 1:
+            for order_id, rider_id in pairs:
+                self.stdout.write(f'  order {order_id} -> rider {rider_id}')
@@ -0,0 +1,36 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core.exports import EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream orders, order items or payments to a CSV or NDJSON file (or stdout) in constant memory.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=sorted(EXPORTS))
+        parser.add_argument('--format', dest='fmt', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--start', type=date.fromisoformat, help='First day to include (YYYY-MM-DD).')
+        parser.add_argument('--end', type=date.fromisoformat, help='Last day to include (YYYY-MM-DD).')
+        parser.add_argument('--status')
+        parser.add_argument('--restaurant-id', type=int)
+        parser.add_argument('--gzip', action='store_true', help='Gzip the output.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched from the database at a time.')
+        parser.add_argument('--output', '-o', help='File to write; defaults to stdout.')
+
+    def handle(self, *args, **options):
+        blocks = stream_export(
+            options['name'], options['fmt'], chunk_size=options['chunk_size'], compress=options['gzip'],
+            start=options['start'], end=options['end'], status=options['status'], restaurant_id=options['restaurant_id'],
+        )
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for block in blocks:
+                output.write(block)
+        finally:
+            if options['output']:
+                output.close()
+            else:
+                output.flush()
@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.scheduler import run_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Generate orders for every subscription cycle due on or before a date. Safe to rerun after a crash.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', type=date.fromisoformat, default=None, help='Last due date to bill (YYYY-MM-DD); defaults to today.')
+        parser.add_argument('--workers', type=int, default=1, help='Worker processes, each owning a range of customer ids.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        until = options['until'] or timezone.localdate()
+        processed = run_scheduler(until, workers=options['workers'], chunk_size=options['chunk_size'])
+        self.stdout.write(f'Processed {processed} due subscriptions up to {until}.')
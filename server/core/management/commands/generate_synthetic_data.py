@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.synthetic import DEFAULT_SCALE, SyntheticDataset
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a realistic synthetic dataset for load testing.'
+
+    def add_arguments(self, parser):
+        for name, default in DEFAULT_SCALE.items():
+            parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+        parser.add_argument('--scale', type=float, default=1.0, help='Multiply every count (except items per restaurant).')
+        parser.add_argument('--days', type=int, default=90, help='Spread historical orders over this many days.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='synthetic', help='Username prefix; must not already be in use.')
+
+    def handle(self, *args, **options):
+        scale = {
+            name: options[name] if name == 'menu_items_per_restaurant' else max(1, round(options[name] * options['scale']))
+            for name in DEFAULT_SCALE
+        }
+        dataset = SyntheticDataset(prefix=options['prefix'], seed=options['seed'], days=options['days'],
+                                   batch_size=options['batch_size'], **scale)
+        try:
+            counts = dataset.generate()
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        for model, count in counts.items():
+            self.stdout.write(f'{model}: {count}')
@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import Payment
+from core.payments import settle_payment
+
+
+class Command(BaseCommand):
+    help = 'Settle payments left pending, e.g. after a gateway error or a worker restart.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, default=60, help='Only retry payments pending for at least this many seconds.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=options['older_than'])
+        pending = Payment.objects.filter(status='pending', created_at__lte=cutoff).order_by('created_at').values_list('pk', flat=True)
+        outcomes = {}
+        for payment_id in pending.iterator():
+            outcome = settle_payment(payment_id)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        summary = ', '.join(f'{count} {outcome}' for outcome, count in sorted(outcomes.items())) or 'nothing to do'
+        self.stdout.write(f'Settled pending payments: {summary}.')
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.ratings import rebuild_all_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute restaurant and rider rating summaries from all reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written = rebuild_all_summaries(batch_size=options['batch_size'])
+        self.stdout.write(f'Rebuilt {written} rating summaries.')
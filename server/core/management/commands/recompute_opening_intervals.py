@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from core.hours import sync_opening_intervals
+from core.models import RestaurantProfile
+
+
+class Command(BaseCommand):
+    help = ('Rebuild every restaurant\'s opening intervals from operating_hours, e.g. after importing data '
+            'or a daylight-saving change in a restaurant\'s timezone.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch, total, invalid = [], 0, []
+        rows = RestaurantProfile.objects.order_by('pk').values_list('pk', 'operating_hours')
+        for row in rows.iterator(chunk_size=options['batch_size']):
+            batch.append(row)
+            if len(batch) == options['batch_size']:
+                invalid += sync_opening_intervals(batch)
+                total, batch = total + len(batch), []
+        if batch:
+            invalid += sync_opening_intervals(batch)
+            total += len(batch)
+        self.stdout.write(f'Recomputed opening intervals for {total} restaurants.')
+        if invalid:
+            self.stderr.write(f"Invalid operating_hours (treated as closed): {', '.join(map(str, invalid))}")
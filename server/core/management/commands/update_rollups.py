@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import rebuild_rollups, update_rollups
+
+
+class Command(BaseCommand):
+    help = ('Fold orders and payments changed since the last run into the hourly and daily analytics rollups. '
+            'Run it every few minutes; use --rebuild after deleting orders or changing the rollup logic.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true', help='Drop all rollups and recompute them from every order.')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Hour buckets recomputed per query.')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            rebuilt = rebuild_rollups()
+        else:
+            rebuilt = update_rollups(chunk_size=options['chunk_size'])
+        self.stdout.write(f'Rebuilt {rebuilt} hourly rollup buckets.')
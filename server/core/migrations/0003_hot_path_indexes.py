@@ -0,0 +1,41 @@
+# Generated by Django 5.1 on 2026-10-18 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='address',
+            index=models.Index(fields=['user', 'is_default'], name='address_user_default_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(fields=['restaurant', 'is_available'], name='menuitem_restaurant_avail_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitem',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['-id'], name='menuitem_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'status'], name='order_customer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['rider', 'status'], name='order_rider_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'preparing', 'ready_for_pickup', 'in_transit'])), fields=['restaurant', 'status'], name='order_restaurant_active_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurantprofile',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['-id'], name='restaurant_active_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-18 14:58
+
+from django.db import migrations, models
+
+from core.geo import geohash_encode
+
+
+def backfill_geohash(apps, schema_editor):
+    RestaurantProfile = apps.get_model('core', 'RestaurantProfile')
+    restaurants = RestaurantProfile.objects.exclude(latitude=None).exclude(longitude=None)
+    batch = []
+    for restaurant in restaurants.only('id', 'latitude', 'longitude').iterator(chunk_size=2000):
+        restaurant.geohash = geohash_encode(float(restaurant.latitude), float(restaurant.longitude))
+        batch.append(restaurant)
+        if len(batch) == 2000:
+            RestaurantProfile.objects.bulk_update(batch, ['geohash'])
+            batch = []
+    RestaurantProfile.objects.bulk_update(batch, ['geohash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurantprofile',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=12),
+        ),
+        migrations.RunPython(backfill_geohash, migrations.RunPython.noop),
+    ]
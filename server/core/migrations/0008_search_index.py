@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from core.search import get_search_backend
+
+
+def install_search_index(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection.vendor)
+    if backend is not None:
+        backend.install(schema_editor)
+
+
+def uninstall_search_index(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection.vendor)
+    if backend is not None:
+        backend.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_rating_summaries'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
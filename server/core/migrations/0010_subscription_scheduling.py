@@ -0,0 +1,71 @@
+# Generated by Django 5.1 on 2026-10-18 15:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_next_run_date(apps, schema_editor):
+    Subscription = apps.get_model('core', 'Subscription')
+    Subscription.objects.filter(next_run_date=None).update(next_run_date=models.F('start_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_payment_pipeline'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1)),
+                ('special_instructions', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='scheduled_for',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='orders', to='core.subscription'),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='delivery_address',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='next_run_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='subscription',
+            name='restaurant',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='subscriptions', to='core.restaurantprofile'),
+        ),
+        migrations.RunPython(backfill_next_run_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='subscription',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['next_run_date', 'customer'], name='subscription_due_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('subscription', 'scheduled_for'), name='order_subscription_cycle_uniq'),
+        ),
+        migrations.AddField(
+            model_name='subscriptionitem',
+            name='menu_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.menuitem'),
+        ),
+        migrations.AddField(
+            model_name='subscriptionitem',
+            name='subscription',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.subscription'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1 on 2026-10-18 15:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_subscription_scheduling'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuItemRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='RestaurantRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket', models.DateTimeField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('delivered_orders', models.PositiveIntegerField(default=0)),
+                ('cancelled_orders', models.PositiveIntegerField(default=0)),
+                ('gross_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('prep_seconds', models.PositiveBigIntegerField(default=0)),
+                ('prep_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Watermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='menuitemrollup',
+            name='menu_item',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.menuitem'),
+        ),
+        migrations.AddField(
+            model_name='menuitemrollup',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.restaurantprofile'),
+        ),
+        migrations.AddField(
+            model_name='restaurantrollup',
+            name='restaurant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='core.restaurantprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='menuitemrollup',
+            index=models.Index(fields=['restaurant', 'period', 'bucket'], name='menuitem_rollup_rest_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='menuitemrollup',
+            constraint=models.UniqueConstraint(fields=('menu_item', 'period', 'bucket'), name='menuitem_rollup_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='restaurantrollup',
+            constraint=models.UniqueConstraint(fields=('restaurant', 'period', 'bucket'), name='restaurant_rollup_uniq'),
+        ),
+    ]
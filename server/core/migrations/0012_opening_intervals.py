@@ -0,0 +1,42 @@
+# Generated by Django 5.1 on 2026-10-18 15:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_opening_intervals(apps, schema_editor):
+    from core.hours import utc_intervals
+
+    RestaurantProfile = apps.get_model('core', 'RestaurantProfile')
+    OpeningInterval = apps.get_model('core', 'OpeningInterval')
+    rows = []
+    for restaurant_id, hours in RestaurantProfile.objects.values_list('id', 'operating_hours').iterator():
+        try:
+            intervals = utc_intervals(hours)
+        except ValueError:
+            continue
+        rows += [OpeningInterval(restaurant_id=restaurant_id, start=start, end=end) for start, end in intervals]
+    OpeningInterval.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OpeningInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.PositiveSmallIntegerField()),
+                ('end', models.PositiveSmallIntegerField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='opening_intervals', to='core.restaurantprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start', 'end'], name='opening_interval_range_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_opening_intervals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 16:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_rider_locations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderevent',
+            name='rider',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.riderprofile'),
+        ),
+    ]
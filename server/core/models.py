@@ -1,6 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser
-from django.core.validators import MinLengthValidator, MaxLengthValidator
+from django.core.validators import MinValueValidator, MaxValueValidator
+
+from .geo import geohash_encode
 
 class User(AbstractUser):
     groups = models.ManyToManyField(
@@ -39,12 +41,71 @@ class RestaurantProfile(models.Model):
     longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
     operating_hours = models.JSONField(default=dict)
     is_active = models.BooleanField(default=True)
+    geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+
+    # Fields that make up the restaurant's search document (see core.search).
+    SEARCH_FIELDS = ('name', 'description', 'cuisine_type')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-id'], condition=models.Q(is_active=True), name='restaurant_active_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_search_fields()
+        return instance
+
+    def remember_search_fields(self):
+        self._search_values = {name: self.__dict__[name] for name in self.SEARCH_FIELDS if name in self.__dict__}
+
+    def changed_search_fields(self, update_fields=None):
+        """SEARCH_FIELDS a save may have changed since the row was loaded or last saved."""
+        names = self.SEARCH_FIELDS if update_fields is None else [name for name in self.SEARCH_FIELDS if name in update_fields]
+        loaded = getattr(self, '_search_values', {})
+        return {name for name in names if name not in loaded or loaded[name] != getattr(self, name)}
+
+    def save(self, *args, **kwargs):
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = geohash_encode(float(self.latitude), float(self.longitude))
+        else:
+            self.geohash = ''
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+class OpeningInterval(models.Model):
+    """A span a restaurant is open, in UTC minutes since Monday 00:00; derived from operating_hours by core.hours."""
+    restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='opening_intervals')
+    start = models.PositiveSmallIntegerField()
+    end = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['start', 'end'], name='opening_interval_range_idx'),
+        ]
 
 class RiderProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='rider_profile')
     vehicle_type = models.CharField(max_length=50)
     license_number = models.CharField(max_length=50)
     is_active = models.BooleanField(default=True)
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+
+class RiderLocation(models.Model):
+    """A GPS point reported by a rider; written in bulk from the in-memory store by core.tracking."""
+    rider = models.ForeignKey(RiderProfile, on_delete=models.CASCADE, related_name='locations')
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    recorded_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['rider', '-recorded_at'], name='riderlocation_rider_time_idx'),
+        ]
 
 class MenuItem(models.Model):
     restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='menu_items')
@@ -55,6 +116,14 @@ class MenuItem(models.Model):
     is_available = models.BooleanField(default=True)
     image_url = models.URLField(blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['restaurant', 'is_available'], name='menuitem_restaurant_avail_idx'),
+            models.Index(fields=['-id'], condition=models.Q(is_available=True), name='menuitem_available_idx'),
+        ]
+
+ACTIVE_ORDER_STATUSES = ['pending', 'preparing', 'ready_for_pickup', 'in_transit']
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -64,6 +133,16 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled')
     ]
+    ACTIVE_STATUSES = ACTIVE_ORDER_STATUSES
+    # Legal moves between STATUS_CHOICES, enforced by core.transitions.
+    TRANSITIONS = {
+        'pending': ['preparing', 'cancelled'],
+        'preparing': ['ready_for_pickup', 'cancelled'],
+        'ready_for_pickup': ['in_transit', 'cancelled'],
+        'in_transit': ['delivered'],
+        'delivered': [],
+        'cancelled': [],
+    }
     customer = models.ForeignKey(CustomerProfile, on_delete=models.CASCADE, related_name='orders')
     restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='orders')
     rider = models.ForeignKey(RiderProfile, on_delete=models.SET_NULL, null=True, related_name='deliveries')
@@ -71,9 +150,54 @@ class Order(models.Model):
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     delivery_address = models.TextField()
     delivery_instructions = models.TextField(blank=True)
+    # Set on orders generated by core.scheduler for one subscription cycle.
+    subscription = models.ForeignKey('Subscription', on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+    scheduled_for = models.DateField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # At most one order per subscription cycle, however often the scheduler reruns.
+            models.UniqueConstraint(fields=['subscription', 'scheduled_for'], name='order_subscription_cycle_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='order_customer_created_idx'),
+            models.Index(fields=['restaurant', '-created_at', '-id'], name='order_restaurant_created_idx'),
+            models.Index(fields=['rider', '-created_at', '-id'], name='order_rider_created_idx'),
+            models.Index(fields=['customer', 'status'], name='order_customer_status_idx'),
+            models.Index(fields=['rider', 'status'], name='order_rider_status_idx'),
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+            models.Index(
+                fields=['restaurant', 'status'],
+                condition=models.Q(status__in=ACTIVE_ORDER_STATUSES),
+                name='order_restaurant_active_idx',
+            ),
+        ]
+
+class OrderEvent(models.Model):
+    """
+    Append-only log of an Order's creation (blank from_status), its status
+    transitions (see core.transitions) and rider assignments (see
+    core.dispatch), which keep the status and set rider.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='events')
+    from_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES, blank=True)
+    to_status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    rider = models.ForeignKey(RiderProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['order', 'created_at', 'id'], name='orderevent_timeline_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError('OrderEvent rows are append-only.')
+        super().save(*args, **kwargs)
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
@@ -92,12 +216,20 @@ class Payment(models.Model):
     payment_method = models.CharField(max_length=50)
     transaction_id = models.CharField(max_length=255, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    failure_reason = models.CharField(max_length=255, blank=True)
+    # Client-chosen Idempotency-Key; the unique index makes retries resolve to one payment.
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True, unique=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='payment_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='payment_status_idx'),
+            models.Index(fields=['updated_at'], name='payment_updated_idx'),
+        ]
+
 class Review(models.Model):
-    MinValueValidator = MinLengthValidator
-    MaxValueValidator = MaxLengthValidator
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='review')
     customer = models.ForeignKey(CustomerProfile, on_delete=models.CASCADE, related_name='reviews')
     restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='reviews')
@@ -106,6 +238,105 @@ class Review(models.Model):
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='review_created_idx'),
+            models.Index(fields=['restaurant', '-created_at', '-id'], name='review_restaurant_created_idx'),
+            models.Index(fields=['rider', '-created_at', '-id'], name='review_rider_created_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Rating summaries are updated from post_save; keep them in the same
+        # transaction as the review itself.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+class RatingSummary(models.Model):
+    """Incrementally maintained review aggregates; see core.ratings."""
+    RECENT_WINDOW = 20
+
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+    # The last RECENT_WINDOW ratings as digits, oldest first.
+    recent_ratings = models.CharField(max_length=RECENT_WINDOW, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+    @property
+    def average(self):
+        return round(self.total / self.count, 2) if self.count else None
+
+    @property
+    def recent_average(self):
+        ratings = [int(r) for r in self.recent_ratings]
+        return round(sum(ratings) / len(ratings), 2) if ratings else None
+
+    @property
+    def histogram(self):
+        return {str(r): getattr(self, f'rating_{r}') for r in range(1, 6)}
+
+class RestaurantRatingSummary(RatingSummary):
+    restaurant = models.OneToOneField(RestaurantProfile, on_delete=models.CASCADE, related_name='rating_summary')
+
+class RiderRatingSummary(RatingSummary):
+    rider = models.OneToOneField(RiderProfile, on_delete=models.CASCADE, related_name='rating_summary')
+
+class Rollup(models.Model):
+    """Per-hour or per-day aggregates kept current by core.rollups; bucket is the period start."""
+    PERIOD_CHOICES = [
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket = models.DateTimeField()
+
+    class Meta:
+        abstract = True
+
+class RestaurantRollup(Rollup):
+    restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='rollups')
+    orders = models.PositiveIntegerField(default=0)
+    delivered_orders = models.PositiveIntegerField(default=0)
+    cancelled_orders = models.PositiveIntegerField(default=0)
+    # Order totals excluding cancellations, and completed payments.
+    gross_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # Seconds from 'preparing' to 'ready_for_pickup', over prep_count orders.
+    prep_seconds = models.PositiveBigIntegerField(default=0)
+    prep_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['restaurant', 'period', 'bucket'], name='restaurant_rollup_uniq'),
+        ]
+
+class MenuItemRollup(Rollup):
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE, related_name='rollups')
+    restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='+')
+    quantity = models.PositiveIntegerField(default=0)
+    sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['menu_item', 'period', 'bucket'], name='menuitem_rollup_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['restaurant', 'period', 'bucket'], name='menuitem_rollup_rest_idx'),
+        ]
+
+class Watermark(models.Model):
+    """How far a background job has processed a stream of changes."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.DateTimeField()
+
 class Subscription(models.Model):
     PLAN_CHOICES = [
         ('weekly', 'Weekly'),
@@ -118,13 +349,38 @@ class Subscription(models.Model):
         ('cancelled', 'Cancelled')
     ]
     customer = models.ForeignKey(CustomerProfile, on_delete=models.CASCADE, related_name='subscriptions')
+    restaurant = models.ForeignKey(RestaurantProfile, on_delete=models.CASCADE, related_name='subscriptions', null=True, blank=True)
     plan_type = models.CharField(max_length=20, choices=PLAN_CHOICES)
     start_date = models.DateField()
     end_date = models.DateField(null=True, blank=True)
+    # Date of the next cycle to bill; advanced by core.scheduler together with the orders it generates.
+    next_run_date = models.DateField(null=True, blank=True)
+    delivery_address = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id'], name='subscription_cust_created_idx'),
+            models.Index(
+                fields=['next_run_date', 'customer'],
+                condition=models.Q(status='active'),
+                name='subscription_due_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.next_run_date is None:
+            self.next_run_date = self.start_date
+        super().save(*args, **kwargs)
+
+class SubscriptionItem(models.Model):
+    subscription = models.ForeignKey(Subscription, on_delete=models.CASCADE, related_name='items')
+    menu_item = models.ForeignKey(MenuItem, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField(default=1)
+    special_instructions = models.TextField(blank=True)
+
 class Address(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='addresses')
     street = models.CharField(max_length=255)
@@ -132,4 +388,9 @@ class Address(models.Model):
     state = models.CharField(max_length=100)
     country = models.CharField(max_length=100)
     postal_code = models.CharField(max_length=20)
-    is_default = models.BooleanField(default=False)
\ No newline at end of file
+    is_default = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_default'], name='address_user_default_idx'),
+        ]
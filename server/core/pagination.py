@@ -0,0 +1,13 @@
+from rest_framework.pagination import CursorPagination
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class CreatedAtCursorPagination(IdCursorPagination):
+    # The cursor position is taken from created_at; id only breaks ties so the
+    # order is stable. Backed by the (..., -created_at, -id) indexes in models.
+    ordering = ('-created_at', '-id')
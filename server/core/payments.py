@@ -0,0 +1,117 @@
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Payment
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChargeResult:
+    succeeded: bool
+    transaction_id: str = ''
+    failure_reason: str = ''
+
+
+class PaymentGateway:
+    """
+    Interface to a card/wallet processor. ``charge`` is called from a
+    worker thread and may block on the network; it receives the payment's
+    idempotency key so a retried settlement never charges twice.
+    """
+
+    def charge(self, payment, idempotency_key):
+        raise NotImplementedError
+
+
+class FakeGateway(PaymentGateway):
+    """In-process gateway for development and tests. Payments made with ``decline_method`` are refused."""
+
+    def __init__(self, latency=0, decline_method='test_decline'):
+        self.latency = latency
+        self.decline_method = decline_method
+        self.charges = {}
+        self._lock = threading.Lock()
+
+    def charge(self, payment, idempotency_key):
+        time.sleep(self.latency)
+        if payment.payment_method == self.decline_method:
+            return ChargeResult(False, failure_reason='Card declined.')
+        with self._lock:
+            transaction_id = self.charges.setdefault(idempotency_key, f'fake_{uuid.uuid4().hex}')
+        return ChargeResult(True, transaction_id=transaction_id)
+
+
+@lru_cache(maxsize=None)
+def get_gateway():
+    return import_string(settings.PAYMENT_GATEWAY)(**settings.PAYMENT_GATEWAY_OPTIONS)
+
+
+def settle_payment(payment_id):
+    """
+    Charge a pending payment and record the outcome. The final UPDATE only
+    matches while the payment is still pending, so settling the same payment
+    twice (say, from a retry sweep) records one result.
+    """
+    payment = Payment.objects.select_related('order').get(pk=payment_id)
+    if payment.status != 'pending':
+        return payment.status
+    try:
+        result = get_gateway().charge(payment, payment.idempotency_key or f'payment-{payment.pk}')
+    except Exception:
+        # Leave the payment pending; process_pending_payments retries it.
+        logger.exception('Gateway error settling payment %s', payment_id)
+        return 'pending'
+    final_status = 'completed' if result.succeeded else 'failed'
+    Payment.objects.filter(pk=payment_id, status='pending').update(
+        status=final_status,
+        transaction_id=result.transaction_id,
+        failure_reason=result.failure_reason,
+        updated_at=timezone.now(),
+    )
+    return final_status
+
+
+def _settle_in_worker(payment_id):
+    # Worker threads hold their own connections; keep them from going stale.
+    close_old_connections()
+    try:
+        return settle_payment(payment_id)
+    finally:
+        close_old_connections()
+
+
+class PaymentWorkerPool:
+    """Settles payments off the request thread. With PAYMENT_WORKERS = 0 settlement runs inline."""
+
+    def __init__(self):
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, payment_id):
+        if settings.PAYMENT_WORKERS == 0:
+            settle_payment(payment_id)
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(settings.PAYMENT_WORKERS, thread_name_prefix='payments')
+            return self._executor.submit(_settle_in_worker, payment_id)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+payment_pool = PaymentWorkerPool()
@@ -0,0 +1,88 @@
+"""
+Cart quotes: price a cart that may span several restaurants in one query,
+and sign the result so order creation can trust its prices.
+
+A quote token carries the customer it was issued to and the price of every
+quoted menu item, signed with SECRET_KEY. For ORDER_QUOTE_TTL seconds an
+order naming it takes item prices from the token instead of reading and
+re-checking the menu items; an item withdrawn within that window can still
+be ordered at the quoted price.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import MenuItem
+
+SALT = 'core.quotes'
+
+
+def price_cart(lines, user_id):
+    """
+    Price ``lines`` of {'menu_item': id, 'quantity': n}, grouped by
+    restaurant in cart order. Raises ValidationError naming every line that
+    cannot be ordered.
+    """
+    rows = {
+        row[0]: row for row in MenuItem.objects.filter(pk__in={line['menu_item'] for line in lines}).values_list(
+            'id', 'name', 'price', 'is_available', 'restaurant_id', 'restaurant__name', 'restaurant__is_active',
+        )
+    }
+    errors, orders = [], {}
+    for line in lines:
+        row = rows.get(line['menu_item'])
+        if row is None:
+            errors.append(f"Menu item {line['menu_item']} does not exist.")
+            continue
+        menu_item_id, name, price, is_available, restaurant_id, restaurant_name, restaurant_active = row
+        if not restaurant_active:
+            errors.append(f'{restaurant_name} is not taking orders.')
+        elif not is_available:
+            errors.append(f'{name} is not available.')
+        else:
+            order = orders.setdefault(restaurant_id, {
+                'restaurant': restaurant_id, 'restaurant_name': restaurant_name, 'items': [], 'total_amount': Decimal('0.00'),
+            })
+            line_total = price * line['quantity']
+            order['items'].append({
+                'menu_item': menu_item_id, 'name': name, 'quantity': line['quantity'],
+                'unit_price': price, 'line_total': line_total,
+            })
+            order['total_amount'] += line_total
+    if errors:
+        raise ValidationError({'items': list(dict.fromkeys(errors))})
+
+    token = signing.dumps({
+        'user': user_id,
+        'prices': [[order['restaurant'], item['menu_item'], str(item['unit_price'])]
+                   for order in orders.values() for item in order['items']],
+    }, salt=SALT, compress=True)
+    total_amount = sum((order['total_amount'] for order in orders.values()), Decimal('0.00'))
+    # Money is rendered as strings, as DecimalField does.
+    for order in orders.values():
+        order['total_amount'] = str(order['total_amount'])
+        for item in order['items']:
+            item['unit_price'], item['line_total'] = str(item['unit_price']), str(item['line_total'])
+    return {
+        'orders': list(orders.values()),
+        'total_amount': str(total_amount),
+        'expires_at': timezone.now() + timedelta(seconds=settings.ORDER_QUOTE_TTL),
+        'quote': token,
+    }
+
+
+def quoted_prices(token, user_id):
+    """{(restaurant id, menu item id): unit price} from a quote issued to ``user_id``. Raises ValidationError."""
+    try:
+        data = signing.loads(token, salt=SALT, max_age=settings.ORDER_QUOTE_TTL)
+    except signing.SignatureExpired:
+        raise ValidationError({'quote': ['This quote has expired; request a new one.']})
+    except signing.BadSignature:
+        raise ValidationError({'quote': ['Invalid quote.']})
+    if data['user'] != user_id:
+        raise ValidationError({'quote': ['Invalid quote.']})
+    return {(restaurant_id, menu_item_id): Decimal(price) for restaurant_id, menu_item_id, price in data['prices']}
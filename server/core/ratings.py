@@ -0,0 +1,103 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Concat, Right
+
+from .models import RatingSummary, RestaurantRatingSummary, Review, RiderRatingSummary
+
+# (summary model, its owner field on the summary, the same owner on Review)
+SUMMARY_TARGETS = [
+    (RestaurantRatingSummary, 'restaurant'),
+    (RiderRatingSummary, 'rider'),
+]
+
+
+def _targets(review):
+    for model, field in SUMMARY_TARGETS:
+        owner_id = getattr(review, f'{field}_id')
+        if owner_id is not None:
+            yield model, field, owner_id
+
+
+def review_added(review):
+    """Fold one new review into its restaurant and rider summaries, one UPDATE each."""
+    rating = int(review.rating)
+    for model, field, owner_id in _targets(review):
+        model.objects.get_or_create(**{f'{field}_id': owner_id})
+        model.objects.filter(**{f'{field}_id': owner_id}).update(
+            count=F('count') + 1,
+            total=F('total') + rating,
+            **{f'rating_{rating}': F(f'rating_{rating}') + 1},
+            recent_ratings=Right(Concat(F('recent_ratings'), Value(str(rating))), RatingSummary.RECENT_WINDOW),
+        )
+
+
+def review_removed(review):
+    rating = int(review.rating)
+    for model, field, owner_id in _targets(review):
+        model.objects.filter(**{f'{field}_id': owner_id}).update(
+            count=F('count') - 1,
+            total=F('total') - rating,
+            **{f'rating_{rating}': F(f'rating_{rating}') - 1},
+            recent_ratings=_recent_ratings(field, owner_id),
+        )
+
+
+def _recent_ratings(field, owner_id):
+    # The removed review may sit anywhere in the window, so re-read it; the
+    # (owner, -created_at) index makes this a bounded scan.
+    ratings = (
+        Review.objects.filter(**{f'{field}_id': owner_id})
+        .order_by('-created_at', '-id')
+        .values_list('rating', flat=True)[:RatingSummary.RECENT_WINDOW]
+    )
+    return ''.join(str(rating) for rating in reversed(ratings))
+
+
+def rebuild_summary(model, field, owner_id):
+    """Recompute a single summary from its reviews, e.g. after a rating edit."""
+    model.objects.update_or_create(**{f'{field}_id': owner_id}, defaults=_aggregate(field, owner_id))
+
+
+def _aggregate(field, owner_id):
+    totals = Review.objects.filter(**{f'{field}_id': owner_id}).aggregate(
+        count=Count('id'),
+        total=Sum('rating', default=0),
+        **{f'rating_{r}': Count('id', filter=Q(rating=r)) for r in range(1, 6)},
+    )
+    totals['recent_ratings'] = _recent_ratings(field, owner_id)
+    return totals
+
+
+def rebuild_all_summaries(batch_size=1000):
+    """
+    Recreate every summary from scratch: one grouped aggregate plus one
+    ordered pass over reviews per summary type. Returns the rows written.
+    """
+    written = 0
+    with transaction.atomic():
+        for model, field in SUMMARY_TARGETS:
+            model.objects.all().delete()
+            owner = f'{field}_id'
+            rows = (
+                Review.objects.exclude(**{owner: None}).values(owner)
+                .annotate(
+                    count=Count('id'),
+                    total=Sum('rating'),
+                    **{f'rating_{r}': Count('id', filter=Q(rating=r)) for r in range(1, 6)},
+                )
+                .order_by()
+            )
+            recent = defaultdict(list)
+            ordered = Review.objects.exclude(**{owner: None}).order_by(owner, '-created_at', '-id')
+            for owner_id, rating in ordered.values_list(owner, 'rating').iterator(chunk_size=batch_size):
+                if len(recent[owner_id]) < RatingSummary.RECENT_WINDOW:
+                    recent[owner_id].append(str(rating))
+            summaries = [
+                model(**row, recent_ratings=''.join(reversed(recent[row[owner]])))
+                for row in rows
+            ]
+            model.objects.bulk_create(summaries, batch_size=batch_size)
+            written += len(summaries)
+    return written
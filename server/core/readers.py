@@ -0,0 +1,177 @@
+from functools import lru_cache
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import ManyToOneRel
+from rest_framework import serializers
+
+from .instrumentation import timed_section
+
+# Fields whose to_representation() returns a values() column unchanged.
+PASSTHROUGH_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.ChoiceField,
+    serializers.FloatField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.ReadOnlyField,
+)
+
+
+def _is_column(model, source_attrs):
+    """Whether a dotted serializer source names a concrete column reachable through forward relations."""
+    for index, attr in enumerate(source_attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return False
+        if not field.concrete:
+            return False
+        if index < len(source_attrs) - 1:
+            if not field.is_relation:
+                return False
+            model = field.related_model
+    return True
+
+
+class ValuesReader:
+    """
+    Read-only rendering of a ModelSerializer straight from ``.values()``
+    rows, skipping model instances and per-row field lookups.
+
+    The plan is compiled once from the serializer's own fields and each
+    value still goes through that field's to_representation() unless it is
+    a plain passthrough, so the output matches the serializer exactly.
+    Nested serializers are read through joins; nested many=True
+    serializers cost one extra query per page. A nested serializer with
+    computed sources (properties, methods) falls back to building that one
+    related instance per row. If such a serializer also renders relations of
+    its own, every row would load them with a query, so ``loads_relations``
+    is set and callers should use the serializer over a select_related
+    queryset instead.
+    """
+
+    def __init__(self, serializer, prefix='', model=None, nullable=False):
+        if isinstance(serializer, type):
+            serializer = serializer()
+        self.model = model or serializer.Meta.model
+        self.pk = self.model._meta.pk.attname
+        self.prefix = prefix
+        self.steps = []
+        self.lookups = []
+        self.children = []
+        self.null_lookup = prefix + self.pk if nullable else None
+        self.instance_fields = None
+        self.loads_relations = False
+
+        fields = list(serializer._readable_fields)
+        if self.null_lookup:
+            self._add_lookup(self.null_lookup)
+        if prefix and not all(self._plain(field) for field in fields):
+            # Computed sources need the related object itself.
+            self.instance_fields = fields
+            self.loads_relations = any(self._follows_relation(field) for field in fields)
+            for field in self.model._meta.concrete_fields:
+                self._add_lookup(prefix + field.attname)
+            return
+        for field in fields:
+            self._compile(field)
+
+    def _plain(self, field):
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) or field.source == '*':
+            return False
+        return _is_column(self.model, field.source_attrs)
+
+    def _follows_relation(self, field):
+        """Whether rendering ``field`` from a bare instance would load a related object."""
+        if isinstance(field, serializers.BaseSerializer):
+            return True
+        try:
+            first = self.model._meta.get_field(field.source_attrs[0])
+        except (FieldDoesNotExist, IndexError):
+            return False
+        return first.is_relation and len(field.source_attrs) > 1
+
+    def _add_lookup(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+
+    def _compile(self, field):
+        name = field.field_name
+        if isinstance(field, serializers.ListSerializer):
+            relation = self.model._meta.get_field(field.source)
+            if self.prefix or not isinstance(relation, ManyToOneRel):
+                raise ImproperlyConfigured(f'{name}: only top-level reverse foreign keys can be read from values().')
+            child = ValuesReader(field.child, model=relation.related_model)
+            self.children.append((name, child, relation.field.name))
+            self.loads_relations |= child.loads_relations
+            self._add_lookup(self.pk)
+            self.steps.append((name, 'many', child))
+            return
+        if isinstance(field, serializers.BaseSerializer):
+            model = self.model
+            for attr in field.source_attrs:
+                model = model._meta.get_field(attr).related_model
+            lookup = '__'.join(field.source_attrs)
+            nested = ValuesReader(field, prefix=self.prefix + lookup + '__', model=model, nullable=True)
+            for item in nested.lookups:
+                self._add_lookup(item)
+            self.loads_relations |= nested.loads_relations
+            self.steps.append((name, 'nested', nested))
+            return
+        if not self._plain(field):
+            raise ImproperlyConfigured(f'{name}: source {field.source!r} is not a database column.')
+        lookup = self.prefix + '__'.join(field.source_attrs)
+        self._add_lookup(lookup)
+        convert = None if isinstance(field, PASSTHROUGH_FIELDS) else field.to_representation
+        self.steps.append((name, lookup, convert))
+
+    def render_row(self, row, children=None):
+        if self.null_lookup and row[self.null_lookup] is None:
+            return None
+        if self.instance_fields is not None:
+            instance = self.model(**{field.attname: row[self.prefix + field.attname] for field in self.model._meta.concrete_fields})
+            data = {}
+            for field in self.instance_fields:
+                attribute = field.get_attribute(instance)
+                data[field.field_name] = None if attribute is None else field.to_representation(attribute)
+            return data
+        data = {}
+        for name, lookup, convert in self.steps:
+            if lookup == 'many':
+                data[name] = children[name].get(row[self.pk], [])
+            elif lookup == 'nested':
+                data[name] = convert.render_row(row)
+            else:
+                value = row[lookup]
+                data[name] = value if convert is None or value is None else convert(value)
+        return data
+
+    def render(self, rows):
+        """Render a list of dicts fetched with ``queryset.values(*reader.lookups)``."""
+        rows = list(rows)
+        child_rows = {}
+        if self.children and rows:
+            ids = [row[self.pk] for row in rows]
+            for name, child, fk in self.children:
+                related = child.model._default_manager.filter(**{f'{fk}__in': ids}).order_by('pk')
+                child_rows[name] = list(related.values(fk, *(lookup for lookup in child.lookups if lookup != fk)))
+        with timed_section('serialize'):
+            children = {}
+            for name, child, fk in self.children:
+                grouped = children[name] = {}
+                for child_row in child_rows.get(name, ()):
+                    grouped.setdefault(child_row[fk], []).append(child.render_row(child_row))
+            return [self.render_row(row, children) for row in rows]
+
+    def read(self, queryset):
+        return self.render(queryset.values(*self.lookups))
+
+
+@lru_cache(maxsize=256)
+def reader_for(serializer_class, fields=(), expand=()):
+    """
+    The compiled ValuesReader for a serializer class and ?fields=/?expand=
+    selection; compiling walks the fields, so it is done once per shape.
+    """
+    return ValuesReader(serializer_class(fields=fields, expand=expand))
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    One client's view of the broker. Pending events are keyed by order, so
+    a burst of updates to the same order collapses to its latest state, and
+    a slow client never holds more than ``max_pending`` orders in memory;
+    past that the oldest pending order is dropped and counted.
+    """
+
+    def __init__(self, user_id, loop, max_pending):
+        self.user_id = user_id
+        self.loop = loop
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._pending = OrderedDict()
+        self._ready = asyncio.Event()
+
+    def _deliver(self, event):
+        self._pending.pop(event['order'], None)
+        self._pending[event['order']] = event
+        if len(self._pending) > self.max_pending:
+            self._pending.popitem(last=False)
+            self.dropped += 1
+        self._ready.set()
+
+    async def next_events(self, timeout=None):
+        """Wait for pending events and return them oldest first; [] on timeout."""
+        if not self._pending:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        self._ready.clear()
+        events = list(self._pending.values())
+        self._pending.clear()
+        return events
+
+
+class OrderBroker:
+    """In-process pub/sub that fans order events out to each interested user's subscriptions."""
+
+    def __init__(self, max_pending=None):
+        self.max_pending = max_pending or settings.ORDER_STREAM_MAX_PENDING
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, asyncio.get_running_loop(), self.max_pending)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def has_subscribers(self, user_ids=None):
+        if user_ids is None:
+            return bool(self._subscriptions)
+        return any(user_id in self._subscriptions for user_id in user_ids)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def publish(self, user_ids, event):
+        """
+        Deliver an event to every subscription of the given users. Safe to
+        call from any thread; delivery happens on each subscription's loop.
+        """
+        event = dict(event, id=next(self._sequence))
+        with self._lock:
+            targets = [sub for user_id in set(user_ids) for sub in self._subscriptions.get(user_id, ())]
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down; it will unsubscribe itself.
+                pass
+        return len(targets)
+
+
+order_broker = OrderBroker()
+
+
+class LocalTransport:
+    """
+    Order events only reach streams served by the process that changed the
+    order. Enough for runserver and tests; anything with more than one
+    process needs a shared transport.
+    """
+    shared = False
+
+    def publish(self, user_ids, event):
+        return order_broker.publish(user_ids, event)
+
+    def start(self):
+        pass
+
+
+class PostgresTransport:
+    """
+    Order events travel through PostgreSQL NOTIFY on ``channel``, so orders
+    changed by WSGI workers, payment and scheduler workers or management
+    commands reach streams held open in any ASGI process. Each process that
+    serves streams runs one listener thread on its own connection, started
+    with its first subscriber, which relays notifications into that
+    process's broker. Events sent while a listener reconnects are lost;
+    clients see the order's next change. Requires psycopg 3.
+    """
+    shared = True
+
+    def __init__(self, channel='order_events', alias='default', reconnect_seconds=1.0):
+        try:
+            import psycopg
+        except ImportError as exc:
+            raise ImproperlyConfigured('PostgresTransport requires the psycopg package.') from exc
+        self.psycopg = psycopg
+        self.channel = channel
+        self.alias = alias
+        self.reconnect_seconds = reconnect_seconds
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, user_ids, event):
+        payload = json.dumps({'users': sorted(user_ids), 'event': event})
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, payload])
+
+    def start(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='order-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        from psycopg import sql
+
+        params = connections[self.alias].get_connection_params()
+        while True:
+            try:
+                with self.psycopg.connect(**params, autocommit=True) as connection:
+                    connection.execute(sql.SQL('LISTEN {}').format(sql.Identifier(self.channel)))
+                    for notify in connection.notifies():
+                        message = json.loads(notify.payload)
+                        order_broker.publish(message['users'], message['event'])
+            except Exception:
+                logger.exception('Order event listener lost its connection; reconnecting.')
+                time.sleep(self.reconnect_seconds)
+
+
+@lru_cache(maxsize=None)
+def get_order_transport():
+    return import_string(settings.ORDER_STREAM_TRANSPORT)(**settings.ORDER_STREAM_TRANSPORT_OPTIONS)
+
+
+def order_events_wanted():
+    """
+    Whether order changes should be published at all. A local transport
+    skips the recipient lookup while nobody is listening; a shared one
+    cannot see other processes' listeners, so it always publishes.
+    """
+    return get_order_transport().shared or order_broker.has_subscribers()
+
+
+def publish_order_events(order_ids):
+    """Publish the current state of several orders, looked up in one query."""
+    from .models import Order
+
+    orders = Order.objects.filter(pk__in=order_ids).values(
+        'id', 'status', 'rider_id', 'updated_at', 'customer__user_id', 'restaurant__user_id', 'rider__user_id',
+    )
+    transport = get_order_transport()
+    for order in orders:
+        user_ids = {order['customer__user_id'], order['restaurant__user_id'], order['rider__user_id']} - {None}
+        transport.publish(user_ids, {
+            'order': order['id'],
+            'status': order['status'],
+            'rider': order['rider_id'],
+            'updated_at': order['updated_at'].isoformat(),
+        })
+
+
+def publish_order_event(order_id):
+    publish_order_events([order_id])
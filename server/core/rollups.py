@@ -0,0 +1,203 @@
+"""
+Hourly and daily restaurant/menu item aggregates for the stats endpoint.
+
+update_rollups() finds orders and payments changed since the last run's
+watermark, marks the (restaurant, hour) buckets those orders were placed
+in as dirty, and recomputes just those buckets from source; the matching
+days are then re-summed from their hourly rows. Recomputing whole buckets
+rather than applying deltas keeps the job idempotent and correct when an
+order changes status or is paid after it was first counted.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import MenuItemRollup, Order, OrderEvent, OrderItem, Payment, RestaurantRollup, Watermark
+
+WATERMARK = 'rollups'
+HOUR = timedelta(hours=1)
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+RESTAURANT_METRICS = ['orders', 'delivered_orders', 'cancelled_orders', 'gross_sales', 'revenue', 'prep_seconds', 'prep_count']
+MENU_ITEM_METRICS = ['quantity', 'sales']
+
+
+def hour_bucket(moment):
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def day_bucket(moment):
+    # Days start at local midnight; with a whole-hour UTC offset every hour
+    # bucket falls inside exactly one day.
+    return timezone.localtime(moment).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def dirty_buckets(since, until):
+    """(restaurant_id, hour) for every order that changed, or whose payment changed, in (since, until]."""
+    orders = Order.objects.filter(updated_at__gt=since, updated_at__lte=until)
+    payments = Payment.objects.filter(updated_at__gt=since, updated_at__lte=until)
+    changed = orders.values_list('restaurant_id', 'created_at').union(
+        payments.values_list('order__restaurant_id', 'order__created_at'), all=True,
+    )
+    return {(restaurant_id, hour_bucket(created_at)) for restaurant_id, created_at in changed.iterator()}
+
+
+def _orders_in(buckets):
+    return reduce(or_, (Q(restaurant_id=restaurant_id, created_at__gte=hour, created_at__lt=hour + HOUR)
+                        for restaurant_id, hour in buckets))
+
+
+def rebuild_hours(buckets):
+    """Recompute the hourly rows for ``buckets`` from orders, items, payments and events."""
+    restaurant_rows = {bucket: dict.fromkeys(RESTAURANT_METRICS, 0) for bucket in buckets}
+    item_rows = defaultdict(lambda: dict.fromkeys(MENU_ITEM_METRICS, 0))
+    orders = Order.objects.filter(_orders_in(buckets))
+
+    placed = {}
+    for order_id, restaurant_id, created_at, status, total, payment_status, paid in orders.values_list(
+            'id', 'restaurant_id', 'created_at', 'status', 'total_amount', 'payment__status', 'payment__amount').iterator():
+        row = restaurant_rows[restaurant_id, hour_bucket(created_at)]
+        placed[order_id] = (restaurant_id, hour_bucket(created_at))
+        row['orders'] += 1
+        row['delivered_orders'] += status == 'delivered'
+        row['cancelled_orders'] += status == 'cancelled'
+        if status != 'cancelled':
+            row['gross_sales'] += total
+        if payment_status == 'completed':
+            row['revenue'] += paid
+
+    items = OrderItem.objects.filter(order__in=orders.exclude(status='cancelled'))
+    for order_id, menu_item_id, quantity, price in items.values_list('order_id', 'menu_item_id', 'quantity', 'item_price').iterator():
+        row = item_rows[menu_item_id, placed[order_id]]
+        row['quantity'] += quantity
+        row['sales'] += quantity * price
+
+    prep_started = {}
+    # Rider assignments are logged with an unchanged status; skip them.
+    events = OrderEvent.objects.filter(order__in=orders, to_status__in=['preparing', 'ready_for_pickup']).exclude(from_status=F('to_status'))
+    for order_id, to_status, at in events.order_by('order_id', 'created_at', 'id').values_list('order_id', 'to_status', 'created_at').iterator():
+        if to_status == 'preparing':
+            prep_started[order_id] = at
+        elif order_id in prep_started:
+            row = restaurant_rows[placed[order_id]]
+            row['prep_seconds'] += max(0, round((at - prep_started.pop(order_id)).total_seconds()))
+            row['prep_count'] += 1
+
+    _replace(RestaurantRollup, 'hour', buckets, [
+        RestaurantRollup(restaurant_id=restaurant_id, period='hour', bucket=hour, **row)
+        for (restaurant_id, hour), row in restaurant_rows.items() if row['orders']
+    ])
+    _replace(MenuItemRollup, 'hour', buckets, [
+        MenuItemRollup(menu_item_id=menu_item_id, restaurant_id=restaurant_id, period='hour', bucket=hour, **row)
+        for (menu_item_id, (restaurant_id, hour)), row in item_rows.items()
+    ])
+
+
+def rebuild_days(days):
+    """Re-sum the daily rows for (restaurant_id, day) pairs from their hourly rows."""
+    spans = [(restaurant_id, day, day + timedelta(days=1)) for restaurant_id, day in days]
+    hours = reduce(or_, (Q(restaurant_id=restaurant_id, bucket__gte=start, bucket__lt=end) for restaurant_id, start, end in spans))
+    for model, metrics, key in ((RestaurantRollup, RESTAURANT_METRICS, ('restaurant_id',)),
+                                (MenuItemRollup, MENU_ITEM_METRICS, ('menu_item_id', 'restaurant_id'))):
+        totals = defaultdict(lambda: dict.fromkeys(metrics, 0))
+        for row in model.objects.filter(hours, period='hour').values(*key, 'bucket', *metrics).iterator():
+            total = totals[tuple(row[name] for name in key), day_bucket(row['bucket'])]
+            for metric in metrics:
+                total[metric] += row[metric]
+        _replace(model, 'day', days, [
+            model(**dict(zip(key, ids)), period='day', bucket=day, **total) for (ids, day), total in totals.items()
+        ])
+
+
+def _replace(model, period, buckets, rows):
+    model.objects.filter(reduce(or_, (Q(restaurant_id=restaurant_id, bucket=bucket) for restaurant_id, bucket in buckets)),
+                         period=period).delete()
+    model.objects.bulk_create(rows)
+
+
+def update_rollups(until=None, chunk_size=200):
+    """
+    Bring the rollups up to date with every change made before ``until``
+    (default: ROLLUP_LAG_SECONDS ago, so transactions still in flight when
+    the job runs are picked up next time). Returns the hour buckets rebuilt.
+    """
+    until = until or timezone.now() - timedelta(seconds=settings.ROLLUP_LAG_SECONDS)
+    with transaction.atomic():
+        # Locking the watermark row keeps two overlapping runs from
+        # interleaving; the loser waits, then sees the advanced watermark.
+        watermark, _ = Watermark.objects.select_for_update().get_or_create(
+            name=WATERMARK, defaults={'value': EPOCH},
+        )
+        if watermark.value >= until:
+            return 0
+        buckets = sorted(dirty_buckets(watermark.value, until))
+        for start in range(0, len(buckets), chunk_size):
+            rebuild_hours(buckets[start:start + chunk_size])
+        days = sorted({(restaurant_id, day_bucket(hour)) for restaurant_id, hour in buckets})
+        for start in range(0, len(days), chunk_size):
+            rebuild_days(days[start:start + chunk_size])
+        watermark.value = until
+        watermark.save(update_fields=['value'])
+    return len(buckets)
+
+
+def rebuild_rollups(until=None):
+    """Drop every rollup and recompute from all orders."""
+    with transaction.atomic():
+        RestaurantRollup.objects.all().delete()
+        MenuItemRollup.objects.all().delete()
+        Watermark.objects.filter(name=WATERMARK).delete()
+        return update_rollups(until)
+
+
+def restaurant_stats(restaurant_id, period, start, end, top=10):
+    """Totals, a per-bucket series and the best-selling items for [start, end), read from rollups only."""
+    rows = list(
+        RestaurantRollup.objects.filter(restaurant_id=restaurant_id, period=period, bucket__gte=start, bucket__lt=end)
+        .order_by('bucket').values('bucket', *RESTAURANT_METRICS)
+    )
+    totals = dict.fromkeys(RESTAURANT_METRICS, 0)
+    for row in rows:
+        for metric in RESTAURANT_METRICS:
+            totals[metric] += row[metric]
+
+    items = defaultdict(lambda: dict.fromkeys(MENU_ITEM_METRICS, 0))
+    for row in MenuItemRollup.objects.filter(restaurant_id=restaurant_id, period=period, bucket__gte=start, bucket__lt=end) \
+            .values('menu_item_id', 'menu_item__name', *MENU_ITEM_METRICS).iterator():
+        item = items[row['menu_item_id'], row['menu_item__name']]
+        for metric in MENU_ITEM_METRICS:
+            item[metric] += row[metric]
+    top_items = sorted(items.items(), key=lambda pair: (-pair[1]['sales'], pair[0][0]))[:top]
+
+    watermark = Watermark.objects.filter(name=WATERMARK).values_list('value', flat=True).first()
+    return {
+        'restaurant': restaurant_id,
+        'period': period,
+        'start': start,
+        'end': end,
+        'as_of': watermark,
+        'totals': _present(totals),
+        'series': [{'bucket': row.pop('bucket'), **_present(row)} for row in rows],
+        'top_items': [{'menu_item': menu_item_id, 'name': name, 'quantity': item['quantity'], 'sales': _money(item['sales'])}
+                      for (menu_item_id, name), item in top_items],
+    }
+
+
+def _money(value):
+    return str(Decimal(value).quantize(Decimal('0.01')))
+
+
+def _present(row):
+    prep_seconds, prep_count = row.pop('prep_seconds'), row.pop('prep_count')
+    return {
+        **row,
+        'gross_sales': _money(row['gross_sales']),
+        'revenue': _money(row['revenue']),
+        'average_prep_minutes': round(prep_seconds / prep_count / 60, 1) if prep_count else None,
+    }
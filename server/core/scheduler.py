@@ -0,0 +1,158 @@
+import calendar
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from functools import partial
+
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F, Max, Min, Q
+from django.utils import timezone
+
+from .models import Order, OrderItem, Subscription, SubscriptionItem
+from .realtime import order_events_wanted, publish_order_events
+from .transitions import log_order_creation
+
+PLAN_DAYS = {'weekly': 7, 'bi_weekly': 14}
+
+
+def next_cycle(plan_type, start_date, current):
+    """The cycle after ``current``. Monthly plans keep start_date's day of month, clamped to short months."""
+    if plan_type in PLAN_DAYS:
+        return current + timedelta(days=PLAN_DAYS[plan_type])
+    year, month = current.year + current.month // 12, current.month % 12 + 1
+    month_days = calendar.monthrange(year, month)[1]
+    return current.replace(year=year, month=month, day=min(start_date.day, month_days))
+
+
+def due_subscriptions(until):
+    """
+    Active subscriptions of active restaurants with a cycle due on or before
+    ``until``; served by subscription_due_idx.
+    """
+    return Subscription.objects.filter(
+        Q(end_date=None) | Q(end_date__gte=F('next_run_date')),
+        status='active',
+        next_run_date__lte=until,
+        restaurant__is_active=True,
+    )
+
+
+def generate_chunk(until, customer_range=None, chunk_size=1000):
+    """
+    Bill one chunk of due subscriptions and return how many were processed.
+
+    Orders, their items and creation events and each subscription's advanced
+    next_run_date are committed in one transaction, so next_run_date is the checkpoint: after
+    a crash the chunk in flight rolls back whole and a rerun picks up
+    exactly the cycles that were never billed. The unique constraint on
+    (subscription, scheduled_for) backs this up if two runs overlap.
+    Cycles missed while the scheduler was down are skipped, not back-billed.
+    """
+    due = due_subscriptions(until)
+    if customer_range is not None:
+        due = due.filter(customer_id__gte=customer_range[0], customer_id__lt=customer_range[1])
+    with transaction.atomic():
+        subscriptions = list(due.order_by('next_run_date', 'customer_id').values(
+            'id', 'customer_id', 'restaurant_id', 'delivery_address', 'plan_type', 'start_date', 'end_date', 'next_run_date',
+        )[:chunk_size])
+        if not subscriptions:
+            return 0
+
+        lines = {}
+        menu = SubscriptionItem.objects.filter(
+            subscription_id__in=[row['id'] for row in subscriptions],
+            menu_item__is_available=True,
+            menu_item__restaurant_id=F('subscription__restaurant_id'),
+        ).values_list('subscription_id', 'menu_item_id', 'quantity', 'special_instructions', 'menu_item__price')
+        for subscription_id, *line in menu:
+            lines.setdefault(subscription_id, []).append(line)
+
+        orders, advanced = [], {}
+        for row in subscriptions:
+            # Bill only the latest cycle due (within end_date); older missed
+            # cycles are skipped.
+            last_day = min(until, row['end_date'] or until)
+            upcoming = cycle = row['next_run_date']
+            while upcoming <= until:
+                if upcoming <= last_day:
+                    cycle = upcoming
+                upcoming = next_cycle(row['plan_type'], row['start_date'], upcoming)
+            advanced.setdefault(upcoming, []).append(row['id'])
+            if row['id'] not in lines:
+                # Nothing orderable this cycle; just move the subscription on.
+                continue
+            orders.append(Order(
+                customer_id=row['customer_id'],
+                restaurant_id=row['restaurant_id'],
+                subscription_id=row['id'],
+                scheduled_for=cycle,
+                delivery_address=row['delivery_address'],
+                total_amount=sum((price * quantity for _, quantity, _, price in lines[row['id']]), Decimal('0')),
+            ))
+
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create([
+            OrderItem(order_id=order.pk, menu_item_id=menu_item_id, quantity=quantity,
+                      item_price=price, special_instructions=instructions)
+            for order in orders
+            for menu_item_id, quantity, instructions, price in lines[order.subscription_id]
+        ])
+        # bulk_create skips post_save: log and publish the new orders here.
+        log_order_creation(orders)
+        if orders and order_events_wanted():
+            transaction.on_commit(partial(publish_order_events, [order.pk for order in orders]))
+        now = timezone.now()
+        for next_run_date, ids in advanced.items():
+            Subscription.objects.filter(pk__in=ids).update(next_run_date=next_run_date, updated_at=now)
+    return len(subscriptions)
+
+
+def generate_partition(until, customer_range=None, chunk_size=1000, max_conflicts=3):
+    """Bill every due subscription in ``customer_range`` chunk by chunk; returns the number processed."""
+    processed = conflicts = 0
+    while True:
+        try:
+            count = generate_chunk(until, customer_range, chunk_size)
+        except IntegrityError:
+            # Another run billed some of this chunk first; re-read what is still due.
+            conflicts += 1
+            if conflicts > max_conflicts:
+                raise
+            continue
+        if not count:
+            return processed
+        processed += count
+
+
+def customer_partitions(until, workers):
+    """Split the due customers' id range into ``workers`` contiguous ranges."""
+    bounds = due_subscriptions(until).aggregate(low=Min('customer_id'), high=Max('customer_id'))
+    if bounds['low'] is None:
+        return []
+    low, high = bounds['low'], bounds['high'] + 1
+    step = -(-(high - low) // workers)
+    return [(start, min(start + step, high)) for start in range(low, high, step)]
+
+
+def _init_worker(database_name):
+    import django
+    django.setup()
+    # Follow the parent onto the same database, e.g. a benchmark's test database.
+    connections['default'].settings_dict['NAME'] = database_name
+
+
+def run_scheduler(until, workers=1, chunk_size=1000):
+    """
+    Bill everything due on or before ``until``. With several workers the due
+    customers are partitioned by id across a process pool; partitions never
+    share a subscription, so workers do not contend for the same rows.
+    """
+    if workers <= 1:
+        return generate_partition(until, chunk_size=chunk_size)
+    partitions = customer_partitions(until, workers)
+    database_name = connections['default'].settings_dict['NAME']
+    # Forked workers must not inherit open connections.
+    connections.close_all()
+    with ProcessPoolExecutor(len(partitions) or 1, initializer=_init_worker, initargs=(database_name,)) as pool:
+        futures = [pool.submit(generate_partition, until, partition, chunk_size) for partition in partitions]
+        return sum(future.result() for future in futures)
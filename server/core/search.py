@@ -0,0 +1,353 @@
+import re
+
+from django.db import connection
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Query terms shorter than this only get prefix matching, not typo tolerance.
+TYPO_MIN_LENGTH = 4
+MAX_TYPO_CANDIDATES = 8
+
+
+def tokenize(query):
+    return [token.lower() for token in TOKEN_RE.findall(query or '')][:10]
+
+
+def within_edit_distance(a, b, limit):
+    """Bounded Levenshtein: True if a and b are at most ``limit`` edits apart."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def typo_limit(token):
+    return 2 if len(token) >= 8 else 1
+
+
+class SearchBackend:
+    """
+    Inverted index over MenuItem and RestaurantProfile, kept in sync by
+    core.signals. Concrete backends own their tables, created by migration
+    0008, and translate a token list into their own match syntax.
+    """
+
+    vendor = None
+
+    def install(self, schema_editor):
+        raise NotImplementedError
+
+    def uninstall(self, schema_editor):
+        raise NotImplementedError
+
+    def index_menu_items(self, cursor, restaurant_id=None, menu_item_ids=None):
+        raise NotImplementedError
+
+    def remove_menu_item(self, cursor, menu_item_id):
+        raise NotImplementedError
+
+    def index_restaurant(self, cursor, restaurant_id):
+        raise NotImplementedError
+
+    def remove_restaurant(self, cursor, restaurant_id):
+        raise NotImplementedError
+
+    def vocabulary(self, cursor, kind, first_char, min_length, max_length):
+        raise NotImplementedError
+
+    def match_menu_items(self, cursor, alternatives, filters, limit):
+        raise NotImplementedError
+
+    def match_restaurants(self, cursor, alternatives, filters, limit):
+        raise NotImplementedError
+
+    def expand(self, cursor, kind, tokens):
+        """
+        Return, per query token, the terms it may match: the token as a
+        prefix, plus indexed terms within a small edit distance of it.
+        """
+        alternatives = []
+        for token in tokens:
+            terms = []
+            if len(token) >= TYPO_MIN_LENGTH:
+                limit = typo_limit(token)
+                vocabulary = self.vocabulary(cursor, kind, token[0], len(token) - limit, len(token) + limit)
+                terms = [term for term in vocabulary if term != token and within_edit_distance(token, term, limit)]
+            alternatives.append((token, terms[:MAX_TYPO_CANDIDATES]))
+        return alternatives
+
+    def search_menu_items(self, query, limit, **filters):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with connection.cursor() as cursor:
+            return self.match_menu_items(cursor, self.expand(cursor, 'menu', tokens), filters, limit)
+
+    def search_restaurants(self, query, limit, **filters):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with connection.cursor() as cursor:
+            return self.match_restaurants(cursor, self.expand(cursor, 'restaurant', tokens), filters, limit)
+
+
+def _menu_filter_sql(filters, params, item='m', restaurant='r'):
+    clauses = [f'{item}.is_available', f'{restaurant}.is_active']
+    if filters.get('category'):
+        clauses.append(f'{item}.category = %s')
+        params.append(filters['category'])
+    if filters.get('cuisine_type'):
+        clauses.append(f'{restaurant}.cuisine_type = %s')
+        params.append(filters['cuisine_type'])
+    if filters.get('min_price') is not None:
+        clauses.append(f'{item}.price >= %s')
+        params.append(filters['min_price'])
+    if filters.get('max_price') is not None:
+        clauses.append(f'{item}.price <= %s')
+        params.append(filters['max_price'])
+    return ' AND '.join(clauses)
+
+
+class SQLiteFTSBackend(SearchBackend):
+    vendor = 'sqlite'
+    TABLES = {'menu': 'core_menuitem_fts', 'restaurant': 'core_restaurant_fts'}
+
+    def install(self, schema_editor):
+        for table, columns in (
+            ('core_menuitem_fts', 'name, description, category, restaurant_name'),
+            ('core_restaurant_fts', 'name, description, cuisine_type'),
+        ):
+            schema_editor.execute(
+                f"CREATE VIRTUAL TABLE {table} USING fts5({columns}, "
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+            schema_editor.execute(f"CREATE VIRTUAL TABLE {table}_vocab USING fts5vocab({table}, 'row')")
+        with schema_editor.connection.cursor() as cursor:
+            self.index_menu_items(cursor)
+            cursor.execute(
+                'INSERT INTO core_restaurant_fts(rowid, name, description, cuisine_type) '
+                'SELECT id, name, description, cuisine_type FROM core_restaurantprofile'
+            )
+
+    def uninstall(self, schema_editor):
+        for table in self.TABLES.values():
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_vocab')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    def index_menu_items(self, cursor, restaurant_id=None, menu_item_ids=None):
+        where, params = '', []
+        if restaurant_id is not None:
+            where, params = 'WHERE m.restaurant_id = %s', [restaurant_id]
+        elif menu_item_ids is not None:
+            where = f"WHERE m.id IN ({', '.join(['%s'] * len(menu_item_ids))})"
+            params = list(menu_item_ids)
+        cursor.execute(
+            f'DELETE FROM core_menuitem_fts WHERE rowid IN (SELECT m.id FROM core_menuitem m {where})', params
+        )
+        cursor.execute(
+            'INSERT INTO core_menuitem_fts(rowid, name, description, category, restaurant_name) '
+            'SELECT m.id, m.name, m.description, m.category, r.name FROM core_menuitem m '
+            f'JOIN core_restaurantprofile r ON r.id = m.restaurant_id {where}',
+            params,
+        )
+
+    def remove_menu_item(self, cursor, menu_item_id):
+        cursor.execute('DELETE FROM core_menuitem_fts WHERE rowid = %s', [menu_item_id])
+
+    def index_restaurant(self, cursor, restaurant_id):
+        self.remove_restaurant(cursor, restaurant_id)
+        cursor.execute(
+            'INSERT INTO core_restaurant_fts(rowid, name, description, cuisine_type) '
+            'SELECT id, name, description, cuisine_type FROM core_restaurantprofile WHERE id = %s',
+            [restaurant_id],
+        )
+
+    def remove_restaurant(self, cursor, restaurant_id):
+        cursor.execute('DELETE FROM core_restaurant_fts WHERE rowid = %s', [restaurant_id])
+
+    def vocabulary(self, cursor, kind, first_char, min_length, max_length):
+        cursor.execute(
+            f"SELECT term FROM {self.TABLES[kind]}_vocab WHERE term >= %s AND term < %s "
+            "AND length(term) BETWEEN %s AND %s",
+            [first_char, first_char + '\uffff', min_length, max_length],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def match_expression(alternatives):
+        groups = []
+        for token, terms in alternatives:
+            options = [f'"{token}"*'] + [f'"{term}"' for term in terms]
+            groups.append('(' + ' OR '.join(options) + ')')
+        return ' AND '.join(groups)
+
+    def match_menu_items(self, cursor, alternatives, filters, limit):
+        params = [self.match_expression(alternatives)]
+        where = _menu_filter_sql(filters, params)
+        cursor.execute(
+            'SELECT m.id FROM core_menuitem_fts '
+            'JOIN core_menuitem m ON m.id = core_menuitem_fts.rowid '
+            'JOIN core_restaurantprofile r ON r.id = m.restaurant_id '
+            f'WHERE core_menuitem_fts MATCH %s AND {where} '
+            # Column weights: name, description, category, restaurant_name.
+            'ORDER BY bm25(core_menuitem_fts, 10.0, 2.0, 4.0, 3.0) LIMIT %s',
+            params + [limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def match_restaurants(self, cursor, alternatives, filters, limit):
+        params = [self.match_expression(alternatives)]
+        where = 'r.is_active'
+        if filters.get('cuisine_type'):
+            where += ' AND r.cuisine_type = %s'
+            params.append(filters['cuisine_type'])
+        cursor.execute(
+            'SELECT r.id FROM core_restaurant_fts '
+            'JOIN core_restaurantprofile r ON r.id = core_restaurant_fts.rowid '
+            f'WHERE core_restaurant_fts MATCH %s AND {where} '
+            'ORDER BY bm25(core_restaurant_fts, 10.0, 2.0, 4.0) LIMIT %s',
+            params + [limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresBackend(SearchBackend):
+    vendor = 'postgresql'
+    MENU_DOCUMENT = (
+        "setweight(to_tsvector('simple', m.name), 'A') || "
+        "setweight(to_tsvector('simple', r.name || ' ' || m.category), 'B') || "
+        "setweight(to_tsvector('simple', m.description), 'C')"
+    )
+    RESTAURANT_DOCUMENT = (
+        "setweight(to_tsvector('simple', r.name), 'A') || "
+        "setweight(to_tsvector('simple', r.cuisine_type), 'B') || "
+        "setweight(to_tsvector('simple', r.description), 'C')"
+    )
+
+    def install(self, schema_editor):
+        schema_editor.execute(
+            'CREATE TABLE core_menuitem_search ('
+            'menu_item_id bigint PRIMARY KEY REFERENCES core_menuitem(id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            'CREATE TABLE core_restaurant_search ('
+            'restaurant_id bigint PRIMARY KEY REFERENCES core_restaurantprofile(id) ON DELETE CASCADE, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute('CREATE TABLE core_search_term (kind varchar(16), term text, PRIMARY KEY (kind, term))')
+        schema_editor.execute('CREATE INDEX core_menuitem_search_gin ON core_menuitem_search USING gin (document)')
+        schema_editor.execute('CREATE INDEX core_restaurant_search_gin ON core_restaurant_search USING gin (document)')
+        with schema_editor.connection.cursor() as cursor:
+            self.index_menu_items(cursor)
+            cursor.execute(
+                f'INSERT INTO core_restaurant_search (restaurant_id, document) '
+                f'SELECT r.id, {self.RESTAURANT_DOCUMENT} FROM core_restaurantprofile r'
+            )
+            self._record_terms(cursor, 'restaurant', 'SELECT document FROM core_restaurant_search')
+
+    def uninstall(self, schema_editor):
+        for table in ('core_menuitem_search', 'core_restaurant_search', 'core_search_term'):
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}')
+
+    def _record_terms(self, cursor, kind, documents_sql, params=()):
+        cursor.execute(
+            'INSERT INTO core_search_term (kind, term) '
+            f'SELECT DISTINCT %s::varchar, unnest(tsvector_to_array(document)) FROM ({documents_sql}) d '
+            'ON CONFLICT DO NOTHING',
+            [kind, *params],
+        )
+
+    def index_menu_items(self, cursor, restaurant_id=None, menu_item_ids=None):
+        where, params = '', []
+        if restaurant_id is not None:
+            where, params = 'WHERE m.restaurant_id = %s', [restaurant_id]
+        elif menu_item_ids is not None:
+            where, params = 'WHERE m.id = ANY(%s)', [list(menu_item_ids)]
+        cursor.execute(
+            'INSERT INTO core_menuitem_search (menu_item_id, document) '
+            f'SELECT m.id, {self.MENU_DOCUMENT} FROM core_menuitem m '
+            f'JOIN core_restaurantprofile r ON r.id = m.restaurant_id {where} '
+            'ON CONFLICT (menu_item_id) DO UPDATE SET document = EXCLUDED.document',
+            params,
+        )
+        self._record_terms(
+            cursor, 'menu',
+            f'SELECT {self.MENU_DOCUMENT} AS document FROM core_menuitem m '
+            f'JOIN core_restaurantprofile r ON r.id = m.restaurant_id {where}',
+            params,
+        )
+
+    def remove_menu_item(self, cursor, menu_item_id):
+        cursor.execute('DELETE FROM core_menuitem_search WHERE menu_item_id = %s', [menu_item_id])
+
+    def index_restaurant(self, cursor, restaurant_id):
+        cursor.execute(
+            'INSERT INTO core_restaurant_search (restaurant_id, document) '
+            f'SELECT r.id, {self.RESTAURANT_DOCUMENT} FROM core_restaurantprofile r WHERE r.id = %s '
+            'ON CONFLICT (restaurant_id) DO UPDATE SET document = EXCLUDED.document',
+            [restaurant_id],
+        )
+        self._record_terms(
+            cursor, 'restaurant',
+            'SELECT document FROM core_restaurant_search WHERE restaurant_id = %s', [restaurant_id],
+        )
+
+    def remove_restaurant(self, cursor, restaurant_id):
+        cursor.execute('DELETE FROM core_restaurant_search WHERE restaurant_id = %s', [restaurant_id])
+
+    def vocabulary(self, cursor, kind, first_char, min_length, max_length):
+        cursor.execute(
+            'SELECT term FROM core_search_term WHERE kind = %s AND term >= %s AND term < %s '
+            'AND length(term) BETWEEN %s AND %s',
+            [kind, first_char, first_char + '\uffff', min_length, max_length],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    @staticmethod
+    def match_expression(alternatives):
+        groups = []
+        for token, terms in alternatives:
+            options = [f"'{token}':*"] + [f"'{term}'" for term in terms]
+            groups.append('(' + ' | '.join(options) + ')')
+        return ' & '.join(groups)
+
+    def match_menu_items(self, cursor, alternatives, filters, limit):
+        params = [self.match_expression(alternatives)]
+        where = _menu_filter_sql(filters, params)
+        cursor.execute(
+            "SELECT m.id FROM core_menuitem_search s, to_tsquery('simple', %s) q, core_menuitem m, "
+            'core_restaurantprofile r '
+            f'WHERE s.document @@ q AND m.id = s.menu_item_id AND r.id = m.restaurant_id AND {where} '
+            'ORDER BY ts_rank(s.document, q) DESC LIMIT %s',
+            params + [limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def match_restaurants(self, cursor, alternatives, filters, limit):
+        params = [self.match_expression(alternatives)]
+        where = 'r.is_active'
+        if filters.get('cuisine_type'):
+            where += ' AND r.cuisine_type = %s'
+            params.append(filters['cuisine_type'])
+        cursor.execute(
+            "SELECT r.id FROM core_restaurant_search s, to_tsquery('simple', %s) q, core_restaurantprofile r "
+            f'WHERE s.document @@ q AND r.id = s.restaurant_id AND {where} '
+            'ORDER BY ts_rank(s.document, q) DESC LIMIT %s',
+            params + [limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+BACKENDS = {backend.vendor: backend for backend in (SQLiteFTSBackend(), PostgresBackend())}
+
+
+def get_search_backend(vendor=None):
+    """Return the backend for a database vendor, or None if search is unsupported there."""
+    return BACKENDS.get(vendor or connection.vendor)
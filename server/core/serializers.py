@@ -1,7 +1,146 @@
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
-from .models import User, CustomerProfile, RestaurantProfile, RiderProfile, MenuItem, Order, OrderItem, Payment, Review, Subscription, Address
+from .models import User, CustomerProfile, RestaurantProfile, RiderProfile, MenuItem, Order, OrderEvent, OrderItem, Payment, Review, Subscription, SubscriptionItem, Address
+from .hours import parse_operating_hours
+from .instrumentation import timed_section
+from .quotes import quoted_prices
+from .transitions import log_order_creation, transition_order
+
+
+def _split_paths(paths):
+    """('a', 'b.c', 'b.d') -> ({'a', 'b'}, {'b': ['c', 'd']})"""
+    top, nested = [], {}
+    for path in paths:
+        head, _, rest = path.partition('.')
+        if head not in top:
+            top.append(head)
+        if rest:
+            nested.setdefault(head, []).append(rest)
+    return top, nested
+
+
+def _query_paths(request, name):
+    value = request.query_params.get(name, '')
+    return tuple(part.strip() for part in value.split(',') if part.strip())
+
+
+class FlexFieldsMixin:
+    """
+    Sparse fieldsets and relation expansion on GET requests.
+
+    ``?fields=id,name,user.username`` keeps only the listed fields, with
+    dotted names reaching into nested serializers. ``?expand=restaurant``
+    renders a relation named in expandable_fields as a nested object
+    instead of its id. Nested serializers receive their part of both from
+    their parent. Without either parameter the output is unchanged.
+    """
+    # Relation field name -> name of the serializer that renders it expanded.
+    expandable_fields = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if fields is None and expand is None and request is not None and request.method in ('GET', 'HEAD'):
+            fields, expand = _query_paths(request, 'fields'), _query_paths(request, 'expand')
+        self.requested_fields = tuple(fields or ())
+        self.requested_expand = tuple(expand or ())
+        if self.requested_fields or self.requested_expand:
+            self._apply_requested()
+
+    def to_representation(self, instance):
+        # Time top-level objects only; nested serializers are inside them.
+        parent = self.parent
+        if parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None):
+            with timed_section('serialize'):
+                return super().to_representation(instance)
+        return super().to_representation(instance)
+
+    def _apply_requested(self):
+        keep, nested_fields = _split_paths(self.requested_fields)
+        expand, nested_expand = _split_paths(self.requested_expand)
+        unknown = [name for name in expand if name not in self.expandable_fields
+                   and not isinstance(self.fields.get(name), serializers.BaseSerializer)]
+        unknown += [name for name in keep if name not in self.fields]
+        if unknown:
+            raise serializers.ValidationError({'detail': f"Unknown fields or relations: {', '.join(unknown)}."})
+
+        for name in expand:
+            if name in self.expandable_fields:
+                self.fields[name] = globals()[self.expandable_fields[name]](
+                    read_only=True, fields=nested_fields.get(name, ()), expand=nested_expand.get(name, ()),
+                )
+        expanded = set(expand) & set(self.expandable_fields)
+        for name in {*nested_fields, *nested_expand} - expanded:
+            field = self.fields.get(name)
+            if isinstance(field, serializers.BaseSerializer):
+                self.fields[name] = _narrow(field, nested_fields.get(name, ()), nested_expand.get(name, ()))
+        if keep:
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+
+def _narrow(field, fields, expand):
+    """Rebuild a declared nested serializer with its own fields/expand."""
+    many = isinstance(field, serializers.ListSerializer)
+    template = field.child if many else field
+    kwargs = {**template._kwargs, 'fields': fields, 'expand': expand}
+    if many:
+        kwargs['many'] = True
+    return type(template)(*template._args, **kwargs)
+
+
+def _related_model(model, source_attrs):
+    for attr in source_attrs:
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if not field.is_relation:
+            return None
+        model = field.related_model
+    return model
 
-class UserSerializer(serializers.ModelSerializer):
+
+def _related_paths(serializer, model, prefix='', prefetching=False):
+    select, prefetch = [], []
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    for field in serializer._readable_fields:
+        if not isinstance(field, serializers.BaseSerializer) or field.source == '*':
+            continue
+        related_model = _related_model(model, field.source_attrs)
+        if related_model is None:
+            continue
+        path = prefix + '__'.join(field.source_attrs)
+        many = prefetching or isinstance(field, serializers.ListSerializer)
+        (prefetch if many else select).append(path)
+        nested_select, nested_prefetch = _related_paths(field, related_model, path + '__', many)
+        select += nested_select
+        prefetch += nested_prefetch
+    return select, prefetch
+
+
+def optimize_queryset(queryset, serializer):
+    """
+    Replace the queryset's select_related/prefetch_related with exactly the
+    relations ``serializer`` renders: nested objects are joined, nested
+    lists prefetched, and relations rendered as ids or left out cost nothing.
+    """
+    select, prefetch = _related_paths(serializer, queryset.model)
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select:
+        queryset = queryset.select_related(*select)
+    return queryset.prefetch_related(*prefetch)
+
+
+class UserSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'phone_number', 'user_type']
@@ -11,68 +150,305 @@ class UserSerializer(serializers.ModelSerializer):
         user = User.objects.create_user(**validated_data)
         return user
 
-class AddressSerializer(serializers.ModelSerializer):
+class AddressSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Address
         fields = ['id', 'street', 'city', 'state', 'country', 'postal_code', 'is_default']
 
-class CustomerProfileSerializer(serializers.ModelSerializer):
+class CustomerProfileSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
-    addresses = AddressSerializer(many=True, read_only=True)
+    addresses = AddressSerializer(source='user.addresses', many=True, read_only=True)
 
     class Meta:
         model = CustomerProfile
         fields = ['id', 'user', 'addresses']
 
-class RestaurantProfileSerializer(serializers.ModelSerializer):
+class RatingSummarySerializer(FlexFieldsMixin, serializers.Serializer):
+    count = serializers.IntegerField()
+    average = serializers.FloatField()
+    recent_average = serializers.FloatField()
+    histogram = serializers.DictField(child=serializers.IntegerField())
+
+class RestaurantProfileSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
+    rating = RatingSummarySerializer(source='rating_summary', read_only=True, allow_null=True)
 
     class Meta:
         model = RestaurantProfile
-        fields = ['id', 'user', 'name', 'description', 'cuisine_type', 'address', 'latitude', 'longitude', 'operating_hours', 'is_active']
+        fields = ['id', 'user', 'name', 'description', 'cuisine_type', 'address', 'latitude', 'longitude', 'operating_hours', 'is_active', 'rating']
+
+    def validate_operating_hours(self, value):
+        try:
+            parse_operating_hours(value)
+        except ValueError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
+class PublicRestaurantSerializer(RestaurantProfileSerializer):
+    """
+    A restaurant as embedded in other resources (menu items, reviews,
+    orders, subscriptions): the owner's account (email, phone number) is
+    left out.
+    """
+    user = None
+
+    class Meta(RestaurantProfileSerializer.Meta):
+        fields = [name for name in RestaurantProfileSerializer.Meta.fields if name != 'user']
+
+class NearbyQuerySerializer(serializers.Serializer):
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radius_km = serializers.FloatField(min_value=0.1, max_value=50, default=5)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    cuisine_type = serializers.CharField(required=False)
+    category = serializers.CharField(required=False)
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+class StatsQuerySerializer(serializers.Serializer):
+    """Date range (inclusive, local days) for /api/restaurants/{id}/stats/; defaults to the last 30 days."""
+    MAX_DAYS = {'hour': 31, 'day': 366}
+
+    period = serializers.ChoiceField(choices=['hour', 'day'], default='day')
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    top = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+    def validate(self, attrs):
+        end = attrs.get('end') or timezone.localdate()
+        start = attrs.get('start') or end - timedelta(days=29)
+        if start > end:
+            raise serializers.ValidationError({'start': 'Must not be after end.'})
+        if (end - start).days >= self.MAX_DAYS[attrs['period']]:
+            raise serializers.ValidationError({'start': f"At most {self.MAX_DAYS[attrs['period']]} days per request for period={attrs['period']}."})
+        attrs['start'], attrs['end'] = start, end
+        return attrs
+
+class CartLineSerializer(serializers.Serializer):
+    menu_item = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+class QuoteRequestSerializer(serializers.Serializer):
+    """A cart for /api/orders/quote/; its lines may come from several restaurants."""
+    MAX_LINES = 100
 
-class RiderProfileSerializer(serializers.ModelSerializer):
+    items = CartLineSerializer(many=True, allow_empty=False, max_length=MAX_LINES)
+
+class ExportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    status = serializers.CharField(required=False)
+    restaurant_id = serializers.IntegerField(required=False)
+
+class RiderProfileSerializer(FlexFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = RiderProfile
-        fields = ['id', 'user', 'vehicle_type', 'license_number', 'is_active']
+        fields = ['id', 'user', 'vehicle_type', 'license_number', 'is_active', 'latitude', 'longitude']
+
+class MenuItemSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'restaurant': 'PublicRestaurantSerializer'}
 
-class MenuItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = MenuItem
         fields = ['id', 'restaurant', 'name', 'description', 'price', 'category', 'is_available', 'image_url']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    # A plain id so a whole order's menu items are looked up in one query at
+    # create time rather than one query per line during validation.
+    menu_item = serializers.IntegerField(source='menu_item_id')
+    quantity = serializers.IntegerField(min_value=1)
+    expandable_fields = {'menu_item': 'MenuItemSerializer'}
+
     class Meta:
         model = OrderItem
         fields = ['id', 'menu_item', 'quantity', 'item_price', 'special_instructions']
+        read_only_fields = ['item_price']
+
+
+def create_orders(orders_data):
+    """
+    Create orders and their items in one transaction, snapshotting current
+    menu prices into item_price and computing total_amount server side.
+    All referenced menu items are fetched with a single query; items already
+    priced from a quote are not looked up at all.
+    """
+    menu_item_ids = {item['menu_item_id'] for data in orders_data for item in data['items'] if 'item_price' not in item}
+    menu_items = MenuItem.objects.only('id', 'restaurant_id', 'price', 'is_available').in_bulk(menu_item_ids) if menu_item_ids else {}
+
+    for data in orders_data:
+        total_amount = Decimal('0.00')
+        for item in data['items']:
+            if 'item_price' not in item:
+                menu_item = menu_items.get(item['menu_item_id'])
+                if menu_item is None or menu_item.restaurant_id != data['restaurant'].id or not menu_item.is_available:
+                    raise serializers.ValidationError(
+                        {'items': [f"Menu item {item['menu_item_id']} is not available from this restaurant."]}
+                    )
+                item['item_price'] = menu_item.price
+            total_amount += item['item_price'] * item['quantity']
+        data['total_amount'] = total_amount
+
+    with transaction.atomic():
+        orders, order_items = [], []
+        for data in orders_data:
+            items_data = data.pop('items')
+            # Orders are saved one by one so post_save receivers still fire;
+            # their line items all go out in a single INSERT.
+            order = Order.objects.create(**data)
+            order_items.extend(OrderItem(order=order, **item_data) for item_data in items_data)
+            orders.append(order)
+        OrderItem.objects.bulk_create(order_items)
+        log_order_creation(orders)
+    return orders
 
-class OrderSerializer(serializers.ModelSerializer):
-    items = OrderItemSerializer(many=True)
+
+class OrderListSerializer(serializers.ListSerializer):
+    def create(self, validated_data):
+        return create_orders(validated_data)
+
+
+class OrderSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'restaurant': 'PublicRestaurantSerializer'}
+    items = OrderItemSerializer(many=True, allow_empty=False)
+    # A token from /api/orders/quote/; its prices are used as they are.
+    quote = serializers.CharField(write_only=True, required=False)
 
     class Meta:
         model = Order
-        fields = ['id', 'customer', 'restaurant', 'rider', 'status', 'total_amount', 'delivery_address', 'delivery_instructions', 'items', 'created_at', 'updated_at']
+        fields = ['id', 'customer', 'restaurant', 'rider', 'status', 'total_amount', 'delivery_address', 'delivery_instructions', 'items', 'subscription', 'scheduled_for', 'created_at', 'updated_at', 'quote']
+        # rider is set by dispatch; status only moves through transitions.
+        read_only_fields = ['customer', 'rider', 'total_amount', 'subscription', 'scheduled_for']
+        list_serializer_class = OrderListSerializer
+
+    def validate(self, attrs):
+        if self.instance is None:
+            # New orders always start pending.
+            attrs.pop('status', None)
+        token = attrs.pop('quote', None)
+        if token is None or 'items' not in attrs:
+            return attrs
+        prices = quoted_prices(token, self.context['request'].user.pk)
+        for item in attrs['items']:
+            price = prices.get((attrs['restaurant'].pk, item['menu_item_id']))
+            if price is None:
+                raise serializers.ValidationError(
+                    {'items': [f"Menu item {item['menu_item_id']} is not in the quote for this restaurant."]}
+                )
+            item['item_price'] = price
+        return attrs
 
     def create(self, validated_data):
-        items_data = validated_data.pop('items')
-        order = Order.objects.create(**validated_data)
-        for item_data in items_data:
-            OrderItem.objects.create(order=order, **item_data)
-        return order
+        return create_orders([validated_data])[0]
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        # The transition and the other fields commit together or not at all.
+        serializers.raise_errors_on_nested_writes('update', self, validated_data)
+        to_status = validated_data.pop('status', instance.status)
+        if to_status != instance.status:
+            request = self.context.get('request')
+            transition_order(instance, to_status, actor=getattr(request, 'user', None))
+        if not validated_data:
+            return instance
+        # Only write the fields that were sent, so this save can never undo
+        # a concurrent status transition.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
+class OrderEventSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = OrderEvent
+        fields = ['id', 'from_status', 'to_status', 'actor', 'rider', 'created_at']
+
+class PaymentSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'order': 'OrderSerializer'}
 
-class PaymentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Payment
-        fields = ['id', 'order', 'amount', 'payment_method', 'transaction_id', 'status', 'created_at', 'updated_at']
+        fields = ['id', 'order', 'amount', 'payment_method', 'transaction_id', 'status', 'failure_reason', 'created_at', 'updated_at']
+        read_only_fields = ['amount', 'transaction_id', 'status', 'failure_reason']
+        # One payment per order is enforced by create() and the database, so
+        # a failed payment can be retried.
+        extra_kwargs = {'order': {'validators': []}}
+
+    def validate_order(self, order):
+        if order.customer.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('You can only pay for your own orders.')
+        if order.status == 'cancelled':
+            raise serializers.ValidationError('Cancelled orders cannot be paid.')
+        return order
+
+    def create(self, validated_data):
+        # The charge is always the order total, never a client-supplied amount.
+        validated_data['amount'] = validated_data['order'].total_amount
+        # An order keeps one payment row: a declined one is reset for the
+        # new attempt. Its gateway key must be new too, or the gateway would
+        # replay the decline.
+        retried = Payment.objects.filter(order=validated_data['order'], status='failed').update(
+            status='pending',
+            amount=validated_data['amount'],
+            payment_method=validated_data['payment_method'],
+            idempotency_key=validated_data.get('idempotency_key') or f'retry-{uuid.uuid4().hex}',
+            transaction_id='',
+            failure_reason='',
+            updated_at=timezone.now(),
+        )
+        if retried:
+            return Payment.objects.get(order=validated_data['order'])
+        return super().create(validated_data)
+
+class ReviewSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'restaurant': 'PublicRestaurantSerializer'}
 
-class ReviewSerializer(serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'order', 'customer', 'restaurant', 'rider', 'rating', 'comment', 'created_at']
+        read_only_fields = ['customer']
+
+class SubscriptionItemSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'menu_item': 'MenuItemSerializer'}
+    quantity = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = SubscriptionItem
+        fields = ['id', 'menu_item', 'quantity', 'special_instructions']
+
+class SubscriptionSerializer(FlexFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'restaurant': 'PublicRestaurantSerializer'}
+    items = SubscriptionItemSerializer(many=True, required=False)
 
-class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
-        fields = ['id', 'customer', 'plan_type', 'start_date', 'end_date', 'status', 'created_at', 'updated_at']
\ No newline at end of file
+        fields = ['id', 'customer', 'restaurant', 'plan_type', 'start_date', 'end_date', 'next_run_date', 'delivery_address', 'status', 'items', 'created_at', 'updated_at']
+        read_only_fields = ['customer', 'next_run_date']
+
+    def validate(self, attrs):
+        restaurant = attrs.get('restaurant', getattr(self.instance, 'restaurant', None))
+        for item in attrs.get('items', []):
+            if item['menu_item'].restaurant_id != getattr(restaurant, 'pk', None):
+                raise serializers.ValidationError({'items': 'Every item must come from the subscription\'s restaurant.'})
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        items = validated_data.pop('items', [])
+        subscription = super().create(validated_data)
+        SubscriptionItem.objects.bulk_create(SubscriptionItem(subscription=subscription, **item) for item in items)
+        return subscription
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        items = validated_data.pop('items', None)
+        subscription = super().update(instance, validated_data)
+        if items is not None:
+            subscription.items.all().delete()
+            SubscriptionItem.objects.bulk_create(SubscriptionItem(subscription=subscription, **item) for item in items)
+        return subscription
\ No newline at end of file
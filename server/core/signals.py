@@ -0,0 +1,91 @@
+from functools import partial
+
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_menu
+from .hours import sync_opening_intervals
+from .models import MenuItem, Order, RestaurantProfile, Review
+from .ratings import SUMMARY_TARGETS, rebuild_summary, review_added, review_removed
+from .realtime import order_events_wanted, publish_order_event
+from .search import get_search_backend
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def menu_item_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_menu, instance.restaurant_id))
+
+
+@receiver([post_save, post_delete], sender=RestaurantProfile)
+def restaurant_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(invalidate_menu, instance.pk))
+
+
+@receiver(post_save, sender=RestaurantProfile)
+def restaurant_hours_changed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'operating_hours' in update_fields:
+        sync_opening_intervals([instance])
+
+
+@receiver(post_save, sender=MenuItem)
+def index_menu_item(sender, instance, using, **kwargs):
+    backend = get_search_backend(connections[using].vendor)
+    if backend is not None:
+        with connections[using].cursor() as cursor:
+            backend.index_menu_items(cursor, menu_item_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=MenuItem)
+def unindex_menu_item(sender, instance, using, **kwargs):
+    backend = get_search_backend(connections[using].vendor)
+    if backend is not None:
+        with connections[using].cursor() as cursor:
+            backend.remove_menu_item(cursor, instance.pk)
+
+
+@receiver(post_save, sender=RestaurantProfile)
+def index_restaurant(sender, instance, using, created, update_fields, **kwargs):
+    # Saves that leave the searchable text alone (hours, location, status)
+    # cost nothing here.
+    changed = instance.changed_search_fields(update_fields)
+    backend = get_search_backend(connections[using].vendor)
+    if changed and backend is not None:
+        with connections[using].cursor() as cursor:
+            backend.index_restaurant(cursor, instance.pk)
+            if not created and 'name' in changed:
+                # Menu documents embed the restaurant name.
+                backend.index_menu_items(cursor, restaurant_id=instance.pk)
+    instance.remember_search_fields()
+
+
+@receiver(post_delete, sender=RestaurantProfile)
+def unindex_restaurant(sender, instance, using, **kwargs):
+    backend = get_search_backend(connections[using].vendor)
+    if backend is not None:
+        with connections[using].cursor() as cursor:
+            backend.remove_restaurant(cursor, instance.pk)
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, **kwargs):
+    # Skip the recipient lookup entirely while nobody is listening.
+    if order_events_wanted():
+        transaction.on_commit(partial(publish_order_event, instance.pk))
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        review_added(instance)
+    else:
+        # Edits are rare and the old rating is gone by now; recount instead.
+        for model, field in SUMMARY_TARGETS:
+            owner_id = getattr(instance, f'{field}_id')
+            if owner_id is not None:
+                rebuild_summary(model, field, owner_id)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    review_removed(instance)
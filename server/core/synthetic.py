@@ -0,0 +1,240 @@
+"""
+Synthetic datasets for load tests and benchmarks, written with bulk
+inserts. Derived data that signals normally maintain (rating summaries,
+the search index, geohashes) is rebuilt in bulk at the end.
+"""
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .geo import geohash_encode
+from .hours import DAYS, sync_opening_intervals
+from .models import (
+    Address, CustomerProfile, MenuItem, Order, OrderEvent, OrderItem, Payment, RestaurantProfile, Review,
+    RiderProfile, Subscription, SubscriptionItem, User,
+)
+from .ratings import rebuild_all_summaries
+from .rollups import rebuild_rollups
+from .search import get_search_backend
+
+CENTER = (6.5244, 3.3792)
+SPREAD = 0.3
+DISHES = ['Jollof Rice', 'Fried Rice', 'Egusi Soup', 'Ogbono Soup', 'Efo Riro', 'Pounded Yam', 'Amala', 'Suya',
+          'Asun', 'Moi Moi', 'Akara', 'Puff Puff', 'Pepper Soup', 'Nkwobi', 'Ofada Rice', 'Banga Soup', 'Boli',
+          'Dodo', 'Shawarma', 'Chapman', 'Zobo', 'Meat Pie', 'Gizdodo', 'Abacha', 'Tuwo Shinkafa']
+EXTRAS = ['Chicken', 'Beef', 'Goat Meat', 'Fish', 'Turkey', 'Plantain', 'Prawns', 'Snail', 'Egg']
+CATEGORIES = ['Mains', 'Soups', 'Swallow', 'Grills', 'Snacks', 'Drinks', 'Sides']
+CUISINES = ['Nigerian', 'Ghanaian', 'Continental', 'Grill', 'Fast Food']
+STREETS = ['Allen Avenue', 'Admiralty Way', 'Awolowo Road', 'Adeola Odeku', 'Herbert Macaulay Way', 'Ozumba Mbadiwe']
+AREAS = ['Ikeja', 'Lekki', 'Ikoyi', 'Victoria Island', 'Yaba', 'Surulere']
+# Final status of generated orders and the path each one took through Order.TRANSITIONS.
+STATUS_WEIGHTS = {'delivered': 70, 'cancelled': 6, 'pending': 6, 'preparing': 6, 'ready_for_pickup': 6, 'in_transit': 6}
+STATUS_PATH = ['pending', 'preparing', 'ready_for_pickup', 'in_transit', 'delivered']
+
+DEFAULT_SCALE = {
+    'customers': 1000,
+    'restaurants': 100,
+    'menu_items_per_restaurant': 20,
+    'riders': 100,
+    'orders': 10_000,
+    'subscriptions': 200,
+}
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """
+    Let bulk_create keep created_at/updated_at values set on the objects
+    instead of stamping them with now(). This flips field flags for the
+    whole process, so only use it in commands, never while serving.
+    """
+    fields = [field for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class SyntheticDataset:
+    def __init__(self, prefix='synthetic', seed=0, days=90, batch_size=5000, **scale):
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.days = days
+        self.batch_size = batch_size
+        self.scale = {**DEFAULT_SCALE, **scale}
+        self.now = timezone.now()
+        self.counts = {}
+
+    def point(self):
+        return (Decimal(f'{CENTER[0] + self.rng.uniform(-SPREAD, SPREAD):.6f}'),
+                Decimal(f'{CENTER[1] + self.rng.uniform(-SPREAD, SPREAD):.6f}'))
+
+    def bulk(self, model, objects):
+        created = model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(created)
+        return created
+
+    def users(self, kind, user_type, count):
+        return self.bulk(User, [
+            User(username=f'{self.prefix}-{kind}-{i}', email=f'{kind}{i}@{self.prefix}.example.com',
+                 phone_number=f'+23480{self.rng.randrange(10**7, 10**8)}', user_type=user_type, password='!')
+            for i in range(count)
+        ])
+
+    def generate(self):
+        """Create the whole dataset in one transaction and return row counts per model."""
+        if User.objects.filter(username__startswith=f'{self.prefix}-').exists():
+            raise ValueError(f'Users prefixed {self.prefix!r} already exist; pick another prefix.')
+        with transaction.atomic(), explicit_timestamps(Order, OrderEvent, Payment, Review, Subscription):
+            customers = self.customers()
+            restaurants = self.restaurants()
+            menus = self.menus(restaurants)
+            riders = self.riders()
+            orders = self.orders(customers, restaurants, menus, riders)
+            self.reviews(orders)
+            self.subscriptions(customers, restaurants, menus)
+            rebuild_all_summaries()
+            rebuild_rollups(until=self.now)
+            backend = get_search_backend()
+            if backend is not None:
+                with connection.cursor() as cursor:
+                    backend.index_menu_items(cursor)
+                    for restaurant in restaurants:
+                        backend.index_restaurant(cursor, restaurant.pk)
+        return self.counts
+
+    def customers(self):
+        users = self.users('customer', 'customer', self.scale['customers'])
+        addresses = self.bulk(Address, [
+            Address(user=user, street=f'{self.rng.randrange(1, 300)} {self.rng.choice(STREETS)}', city='Lagos',
+                    state=self.rng.choice(AREAS), country='Nigeria', postal_code=f'{self.rng.randrange(100, 106)}001',
+                    is_default=True)
+            for user in users
+        ])
+        return self.bulk(CustomerProfile, [CustomerProfile(user=user, default_address=address)
+                                           for user, address in zip(users, addresses)])
+
+    def restaurants(self):
+        profiles = []
+        for user in self.users('owner', 'restaurant_owner', self.scale['restaurants']):
+            latitude, longitude = self.point()
+            opens = self.rng.choice([7, 8, 9, 10])
+            profiles.append(RestaurantProfile(
+                user=user, name=f"{self.rng.choice(['Mama', 'Iya', 'Chef', 'Buka'])} {self.rng.choice(EXTRAS)} Kitchen {user.pk}",
+                description='Home-style meals cooked fresh daily.', cuisine_type=self.rng.choice(CUISINES),
+                address=f'{self.rng.randrange(1, 300)} {self.rng.choice(STREETS)}, {self.rng.choice(AREAS)}',
+                latitude=latitude, longitude=longitude, geohash=geohash_encode(float(latitude), float(longitude)),
+                operating_hours={day: f'{opens:02d}:00-{opens + 12:02d}:00' for day in DAYS},
+                is_active=self.rng.random() > 0.05,
+            ))
+        profiles = self.bulk(RestaurantProfile, profiles)
+        sync_opening_intervals(profiles)
+        return profiles
+
+    def menus(self, restaurants):
+        items = []
+        for restaurant in restaurants:
+            for _ in range(self.scale['menu_items_per_restaurant']):
+                dish = self.rng.choice(DISHES)
+                items.append(MenuItem(
+                    restaurant=restaurant, name=f'{dish} with {self.rng.choice(EXTRAS)}', category=self.rng.choice(CATEGORIES),
+                    description=f'{dish} served with {self.rng.choice(EXTRAS).lower()}', price=Decimal(self.rng.randrange(500, 8000, 50)),
+                    is_available=self.rng.random() > 0.1,
+                ))
+        menus = {}
+        for item in self.bulk(MenuItem, items):
+            if item.is_available:
+                menus.setdefault(item.restaurant_id, []).append(item)
+        return menus
+
+    def riders(self):
+        riders = []
+        for i, user in enumerate(self.users('rider', 'rider', self.scale['riders'])):
+            latitude, longitude = self.point()
+            riders.append(RiderProfile(user=user, vehicle_type=self.rng.choice(['bicycle', 'motorcycle', 'car']),
+                                       license_number=f'LAG-{i:05d}', latitude=latitude, longitude=longitude))
+        return self.bulk(RiderProfile, riders)
+
+    def orders(self, customers, restaurants, menus, riders):
+        open_restaurants = [restaurant for restaurant in restaurants if menus.get(restaurant.pk)]
+        statuses, weights = zip(*STATUS_WEIGHTS.items())
+        orders, lines, timelines = [], [], []
+        for _ in range(self.scale['orders']):
+            customer = self.rng.choice(customers)
+            restaurant = self.rng.choice(open_restaurants)
+            status = self.rng.choices(statuses, weights)[0]
+            created = self.now - timedelta(days=self.rng.uniform(0, self.days)) if status in ('delivered', 'cancelled') \
+                else self.now - timedelta(minutes=self.rng.uniform(1, 90))
+            picked = self.rng.sample(menus[restaurant.pk], min(len(menus[restaurant.pk]), self.rng.randint(1, 4)))
+            quantities = [self.rng.randint(1, 3) for _ in picked]
+            timeline = self.timeline(status, created)
+            orders.append(Order(
+                customer=customer, restaurant=restaurant, status=status,
+                rider=self.rng.choice(riders) if status in ('ready_for_pickup', 'in_transit', 'delivered') and riders else None,
+                total_amount=sum(item.price * quantity for item, quantity in zip(picked, quantities)),
+                delivery_address='1 Marina Road, Lagos', created_at=created, updated_at=timeline[-1][1] if timeline else created,
+            ))
+            lines.append(list(zip(picked, quantities)))
+            timelines.append(timeline)
+        orders = self.bulk(Order, orders)
+        self.bulk(OrderItem, [OrderItem(order=order, menu_item=item, quantity=quantity, item_price=item.price)
+                              for order, order_lines in zip(orders, lines) for item, quantity in order_lines])
+        self.bulk(OrderEvent, [
+            OrderEvent(order=order, from_status=from_status, to_status=to_status, created_at=at)
+            for order, timeline in zip(orders, timelines)
+            for (from_status, _), (to_status, at) in zip([('', None)] + timeline, timeline)
+        ])
+        self.bulk(Payment, [
+            Payment(order=order, amount=order.total_amount, payment_method=self.rng.choice(['card', 'transfer', 'wallet']),
+                    status='completed', transaction_id=f'{self.prefix}-{order.pk}', created_at=order.created_at,
+                    updated_at=order.created_at, idempotency_key=f'{self.prefix}-order-{order.pk}')
+            for order in orders if order.status != 'cancelled'
+        ])
+        return orders
+
+    def timeline(self, status, created):
+        """[(status, entered_at), ...] from pending to ``status``, with plausible gaps."""
+        if status == 'cancelled':
+            return [('pending', created), ('cancelled', created + timedelta(minutes=self.rng.uniform(1, 15)))]
+        steps, at = [], created
+        gaps = {'preparing': (1, 10), 'ready_for_pickup': (10, 40), 'in_transit': (2, 15), 'delivered': (10, 45)}
+        for step in STATUS_PATH[:STATUS_PATH.index(status) + 1]:
+            if step != 'pending':
+                at += timedelta(minutes=self.rng.uniform(*gaps[step]))
+            steps.append((step, at))
+        return steps
+
+    def reviews(self, orders):
+        self.bulk(Review, [
+            Review(order=order, customer_id=order.customer_id, restaurant_id=order.restaurant_id, rider_id=order.rider_id,
+                   rating=self.rng.choices([1, 2, 3, 4, 5], [3, 5, 12, 35, 45])[0], comment='',
+                   created_at=order.updated_at + timedelta(hours=1))
+            for order in orders if order.status == 'delivered' and self.rng.random() < 0.3
+        ])
+
+    def subscriptions(self, customers, restaurants, menus):
+        open_restaurants = [restaurant for restaurant in restaurants if menus.get(restaurant.pk)]
+        subscriptions = []
+        for _ in range(self.scale['subscriptions']):
+            start = (self.now - timedelta(days=self.rng.randrange(0, 60))).date()
+            subscriptions.append(Subscription(
+                customer=self.rng.choice(customers), restaurant=self.rng.choice(open_restaurants),
+                plan_type=self.rng.choice(['weekly', 'bi_weekly', 'monthly']), start_date=start, next_run_date=start,
+                delivery_address='1 Marina Road, Lagos', status=self.rng.choices(['active', 'paused', 'cancelled'], [85, 10, 5])[0],
+                created_at=self.now, updated_at=self.now,
+            ))
+        subscriptions = self.bulk(Subscription, subscriptions)
+        self.bulk(SubscriptionItem, [
+            SubscriptionItem(subscription=subscription, menu_item=item, quantity=self.rng.randint(1, 2))
+            for subscription in subscriptions
+            for item in self.rng.sample(menus[subscription.restaurant_id], min(2, len(menus[subscription.restaurant_id])))
+        ])
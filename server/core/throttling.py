@@ -0,0 +1,204 @@
+"""
+Token-bucket rate limiting and single-flight coalescing for read endpoints.
+
+Each client (user id, or IP for anonymous requests) gets one bucket per
+route holding up to ``burst`` tokens that refill at the quota's rate; a
+request spends one token or is rejected with 429 and a Retry-After. Quotas
+live in THROTTLE_QUOTAS and buckets in the THROTTLE_STORE backend.
+"""
+import threading
+import time
+from functools import lru_cache, partial
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+from .instrumentation import route_of
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_quota(quota):
+    """('120/min', 30) -> (2.0 tokens per second, burst of 30)."""
+    rate, burst = quota
+    count, period = rate.split('/')
+    return int(count) / PERIODS[period], burst
+
+
+class LocMemStore:
+    """Buckets in this process's memory; each worker process limits on its own."""
+
+    def __init__(self, max_keys=100_000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """Spend one token from ``key``'s bucket. Returns (allowed, seconds until a token is available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            if len(self._buckets) >= self.max_keys and key not in self._buckets:
+                # A bucket that has refilled completely carries no state.
+                self._buckets = {k: bucket for k, bucket in self._buckets.items() if bucket[2] > now}
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisStore:
+    """
+    Buckets shared by every process through Redis, or anything speaking its
+    protocol. The refill-and-spend step runs as one Lua script using the
+    server's clock, so concurrent workers cannot double-spend a token.
+    Requires the ``redis`` package.
+    """
+    SCRIPT = """
+        local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+        local clock = redis.call('TIME')
+        local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+        local tokens = tonumber(state[1]) or burst
+        local updated = tonumber(state[2]) or now
+        tokens = math.min(burst, tokens + (now - updated) * rate)
+        local allowed = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+        redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+        return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='throttle:'):
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisStore requires the redis package.') from exc
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, rate, burst):
+        allowed, tokens = self.script(keys=[self.prefix + key], args=[rate, burst])
+        return bool(allowed), 0.0 if allowed else (1 - float(tokens)) / rate
+
+    def clear(self):
+        for key in self.client.scan_iter(f'{self.prefix}*'):
+            self.client.delete(key)
+
+
+@lru_cache(maxsize=None)
+def get_throttle_store():
+    return import_string(settings.THROTTLE_STORE)(**settings.THROTTLE_STORE_OPTIONS)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per-route quota from THROTTLE_QUOTAS, falling back to its '*' entry."""
+
+    def allow_request(self, request, view):
+        quotas = settings.THROTTLE_QUOTAS.get(route_of(request)) or settings.THROTTLE_QUOTAS.get('*')
+        kind = 'user' if request.user and request.user.is_authenticated else 'anon'
+        if not quotas or kind not in quotas:
+            return True
+        rate, burst = parse_quota(quotas[kind])
+        ident = request.user.pk if kind == 'user' else self.get_ident(request)
+        allowed, self.retry_after = get_throttle_store().take(f'{route_of(request)}:{kind}:{ident}', rate, burst)
+        return allowed
+
+    def wait(self):
+        return self.retry_after
+
+
+class SingleFlight:
+    """
+    Run a function once per key at a time: callers arriving while it runs
+    wait for and share its result (or exception) instead of running it again.
+    Process-local, so it coalesces across the threads of one worker.
+    """
+
+    class Call:
+        def __init__(self):
+            self.done = threading.Event()
+            self.result = self.error = None
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Returns (result, shared) where ``shared`` is True for callers that waited."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = self.Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = func()
+        except Exception as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+read_flights = SingleFlight()
+COALESCE_HEADERS = ['Accept', 'If-None-Match', 'If-Modified-Since']
+
+
+class CoalescedReadMixin:
+    """
+    Let identical concurrent GETs share one rendered response. Requests are
+    identical when they have the same path and query, user (or are both
+    anonymous) and the headers in COALESCE_HEADERS. Authentication,
+    permissions and throttles still run for every request; only the
+    handler and rendering are shared.
+    """
+    coalesce_reads = True
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.coalesce_reads and settings.COALESCE_READS and request.method == 'GET':
+            # dispatch() looks the handler up after initial(), so this
+            # replaces it for this request only.
+            self.get = partial(self._coalesced_get, self.get)
+
+    def _coalesced_get(self, handler, request, *args, **kwargs):
+        key = (
+            request.get_full_path(),
+            request.user.pk if request.user and request.user.is_authenticated else None,
+            *(request.headers.get(name, '') for name in COALESCE_HEADERS),
+        )
+
+        def render():
+            response = self.finalize_response(request, handler(request, *args, **kwargs), *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+        response, shared = read_flights.do(key, render)
+        if not shared:
+            return response
+        copy = HttpResponse(response.content, status=response.status_code)
+        for name, value in response.items():
+            copy[name] = value
+        return copy
@@ -0,0 +1,293 @@
+"""
+Live rider positions, held in memory and flushed to RiderLocation in bulk.
+
+Riders POST batches of [latitude, longitude, unix time] points to
+/api/riders/locations/. Every rider owns a row of one numpy array holding
+their last RIDER_LOCATION_HISTORY points as a ring buffer, so recording a
+batch is a slice assignment and reading the latest position is an array
+lookup. Accepted points are also queued; a background thread writes them
+to RiderLocation and copies each rider's newest point to RiderProfile,
+which dispatch reads, every RIDER_LOCATION_FLUSH_SECONDS (0 flushes inline
+after each batch).
+
+Like the order stream broker the store is process-local: run tracking on
+one worker, or route a rider's updates and their customers' reads to the
+same one. Points still queued when a process exits are lost.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+
+from .models import Order, RiderLocation, RiderProfile
+
+logger = logging.getLogger(__name__)
+
+# Points stamped further than this into the future reject the batch.
+CLOCK_SKEW_SECONDS = 60
+TRACKED_STATUSES = ('ready_for_pickup', 'in_transit')
+
+
+def parse_points(data, now=None):
+    """(n, 3) float array of a batch's [latitude, longitude, unix time] points, oldest first. Raises ValueError."""
+    points = data.get('points') if isinstance(data, dict) else None
+    if not isinstance(points, list) or not points:
+        raise ValueError('Expected {"points": [[latitude, longitude, unix time], ...]}.')
+    if len(points) > settings.RIDER_LOCATION_BATCH_MAX:
+        raise ValueError(f'At most {settings.RIDER_LOCATION_BATCH_MAX} points are accepted per batch.')
+    try:
+        array = np.array(points, dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError('Each point must be [latitude, longitude, unix time].')
+    if array.ndim != 2 or array.shape[1] != 3 or not np.isfinite(array).all():
+        raise ValueError('Each point must be [latitude, longitude, unix time].')
+    if (np.abs(array[:, 0]) > 90).any() or (np.abs(array[:, 1]) > 180).any():
+        raise ValueError('Latitude must be within [-90, 90] and longitude within [-180, 180].')
+    if (array[:, 2] > (time.time() if now is None else now) + CLOCK_SKEW_SECONDS).any():
+        raise ValueError('Points cannot be recorded in the future.')
+    return array[np.argsort(array[:, 2], kind='stable')]
+
+
+def position_payload(point):
+    latitude, longitude, recorded_at = point
+    return {
+        'latitude': latitude,
+        'longitude': longitude,
+        'recorded_at': datetime.fromtimestamp(recorded_at, dt_timezone.utc).isoformat().replace('+00:00', 'Z'),
+    }
+
+
+class LocationStore:
+    """
+    Recent points for every rider in one (riders, history, 3) array. Rows
+    are handed out on a rider's first update and the array doubles when it
+    fills. Also remembers, per order, which rider a customer may follow.
+    """
+
+    def __init__(self, history=None, capacity=1024, max_pending=None):
+        self.history = history or settings.RIDER_LOCATION_HISTORY
+        self.max_pending = max_pending or settings.RIDER_LOCATION_MAX_PENDING
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._rows = {}
+        self._points = np.zeros((capacity, self.history, 3))
+        # Points ever written to each row; the newest sits at (written - 1) % history.
+        self._written = np.zeros(capacity, dtype=np.int64)
+        self._pending = deque()
+        self._pending_count = 0
+        self._orders = {}
+        self._riders_by_user = {}
+
+    def _row(self, rider_id):
+        row = self._rows.get(rider_id)
+        if row is None:
+            row = len(self._rows)
+            if row == len(self._points):
+                self._points = np.concatenate([self._points, np.zeros_like(self._points)])
+                self._written = np.concatenate([self._written, np.zeros_like(self._written)])
+            self._rows[rider_id] = row
+        return row
+
+    def add(self, rider_id, points):
+        """
+        Record ``points`` (from parse_points) for a rider and queue them for
+        the history table. Points no newer than the rider's latest are
+        ignored. Returns the number accepted.
+        """
+        with self._lock:
+            row = self._row(rider_id)
+            written = int(self._written[row])
+            if written:
+                points = points[points[:, 2] > self._points[row, (written - 1) % self.history, 2]]
+            count = len(points)
+            if not count:
+                return 0
+            tail = points[-self.history:]
+            self._points[row, (written + count - len(tail) + np.arange(len(tail))) % self.history] = tail
+            self._written[row] = written + count
+            self._pending.append((rider_id, points))
+            self._pending_count += count
+            self._trim()
+        return count
+
+    def _trim(self):
+        # History writes have fallen behind; drop the oldest queued batches.
+        while self._pending_count > self.max_pending:
+            _, points = self._pending.popleft()
+            self._pending_count -= len(points)
+            self.dropped += len(points)
+
+    def latest(self, rider_id):
+        """(latitude, longitude, unix time) of the rider's newest point, or None."""
+        with self._lock:
+            row = self._rows.get(rider_id)
+            if row is None or not self._written[row]:
+                return None
+            return tuple(self._points[row, (self._written[row] - 1) % self.history].tolist())
+
+    def trail(self, rider_id):
+        """The rider's retained points as an (n, 3) array, oldest first."""
+        with self._lock:
+            row = self._rows.get(rider_id)
+            written = 0 if row is None else int(self._written[row])
+            count = min(written, self.history)
+            return self._points[row, (written - count + np.arange(count)) % self.history] if count else np.empty((0, 3))
+
+    def drain(self):
+        """Take every queued (rider id, points) batch, oldest first."""
+        with self._lock:
+            batches, self._pending = list(self._pending), deque()
+            self._pending_count = 0
+        return batches
+
+    def requeue(self, batches):
+        """Put drained batches back ahead of anything queued since, e.g. after a failed write."""
+        with self._lock:
+            self._pending.extendleft(reversed(batches))
+            self._pending_count += sum(len(points) for _, points in batches)
+            self._trim()
+
+    def pending_count(self):
+        return self._pending_count
+
+    def remember_order(self, order_id, rider_id, customer_user_id, ttl, max_orders=100_000):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._orders) >= max_orders:
+                self._orders = {key: entry for key, entry in self._orders.items() if entry[2] > now}
+            self._orders[order_id] = (rider_id, customer_user_id, now + ttl)
+
+    def remembered_order(self, order_id):
+        """(rider id or None, customer's user id) if remembered and not expired."""
+        entry = self._orders.get(order_id)
+        if entry is None or entry[2] < time.monotonic():
+            return None
+        return entry[:2]
+
+    def forget_orders(self, order_ids):
+        with self._lock:
+            for order_id in order_ids:
+                self._orders.pop(order_id, None)
+
+    def rider_for_user(self, user_id):
+        """The user's rider profile id, looked up once per process; None for non-riders."""
+        rider_id = self._riders_by_user.get(user_id)
+        if rider_id is None:
+            rider_id = RiderProfile.objects.filter(user_id=user_id).values_list('pk', flat=True).first()
+            if rider_id is not None:
+                self._riders_by_user[user_id] = rider_id
+        return rider_id
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._written[:] = 0
+            self._pending.clear()
+            self._pending_count = self.dropped = 0
+            self._orders.clear()
+            self._riders_by_user.clear()
+
+
+def order_tracking(order_id, store=None):
+    """
+    (rider id or None, customer's user id) for an order, or None if it does
+    not exist. The rider is only given while the order is ready for pickup
+    or in transit. Answers are kept for ORDER_TRACKING_TTL seconds, so
+    repeated reads of the same order do not query the database.
+    """
+    store = store or rider_locations
+    found = store.remembered_order(order_id)
+    if found is None:
+        row = Order.objects.filter(pk=order_id).values_list('rider_id', 'status', 'customer__user_id').first()
+        if row is None:
+            return None
+        rider_id, status, customer_user_id = row
+        found = (rider_id if status in TRACKED_STATUSES else None, customer_user_id)
+        store.remember_order(order_id, *found, settings.ORDER_TRACKING_TTL)
+    return found
+
+
+def flush_locations(store=None, batch_size=1000):
+    """
+    Write queued points to RiderLocation and each rider's newest point to
+    RiderProfile, in bulk. Points of riders that no longer exist are
+    discarded; on failure everything is requeued. Returns the number of
+    points written.
+    """
+    store = store or rider_locations
+    batches = store.drain()
+    if not batches:
+        return 0
+    try:
+        existing = set(RiderProfile.objects.filter(pk__in={rider_id for rider_id, _ in batches}).values_list('pk', flat=True))
+        rows, latest = [], {}
+        for rider_id, points in batches:
+            if rider_id not in existing:
+                continue
+            rows += [
+                RiderLocation(rider_id=rider_id, latitude=lat, longitude=lng,
+                              recorded_at=datetime.fromtimestamp(at, dt_timezone.utc))
+                for lat, lng, at in points.tolist()
+            ]
+            # Batches are queued in arrival order and each only holds newer points.
+            latest[rider_id] = points[-1].tolist()
+        with transaction.atomic():
+            RiderLocation.objects.bulk_create(rows, batch_size=batch_size)
+            RiderProfile.objects.bulk_update(
+                [RiderProfile(pk=rider_id, latitude=Decimal(f'{lat:.8f}'), longitude=Decimal(f'{lng:.8f}'))
+                 for rider_id, (lat, lng, _) in latest.items()],
+                ['latitude', 'longitude'], batch_size=batch_size,
+            )
+    except Exception:
+        store.requeue(batches)
+        raise
+    return len(rows)
+
+
+class LocationFlusher:
+    """Runs flush_locations every RIDER_LOCATION_FLUSH_SECONDS on a daemon thread started by the first update."""
+
+    def __init__(self, store):
+        self.store = store
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    def notify(self):
+        if settings.RIDER_LOCATION_FLUSH_SECONDS == 0:
+            flush_locations(self.store)
+            return
+        with self._lock:
+            if self._thread is None:
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='rider-locations', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(settings.RIDER_LOCATION_FLUSH_SECONDS):
+            # This thread holds its own connection; keep it from going stale.
+            close_old_connections()
+            try:
+                flush_locations(self.store)
+            except Exception:
+                logger.exception('Flushing rider locations failed; the points stay queued.')
+        connection.close()
+
+    def stop(self, flush=True):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopping.set()
+            thread.join()
+        if flush:
+            flush_locations(self.store)
+
+
+rider_locations = LocationStore()
+location_flusher = LocationFlusher(rider_locations)
@@ -0,0 +1,55 @@
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import Order, OrderEvent
+from .realtime import order_events_wanted, publish_order_event
+from .tracking import rider_locations
+
+
+class InvalidTransition(ValidationError):
+    pass
+
+
+class TransitionConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The order status changed concurrently; reload it and retry.'
+    default_code = 'conflict'
+
+
+def log_order_creation(orders):
+    """Write the first OrderEvent of each newly inserted order, in one INSERT."""
+    OrderEvent.objects.bulk_create(OrderEvent(order=order, from_status='', to_status=order.status) for order in orders)
+
+
+def transition_order(order, to_status, actor=None):
+    """
+    Move ``order`` from its loaded status to ``to_status``.
+
+    The write is a compare-and-set: the UPDATE only matches while the row
+    still holds the status this caller saw, so of two racing updates exactly
+    one wins and the other gets TransitionConflict, without row locks. The
+    OrderEvent is written in the same transaction.
+    """
+    from_status = order.status
+    if to_status not in Order.TRANSITIONS.get(from_status, ()):
+        raise InvalidTransition({'status': [f'Cannot move an order from {from_status} to {to_status}.']})
+
+    now = timezone.now()
+    with transaction.atomic():
+        updated = Order.objects.filter(pk=order.pk, status=from_status).update(status=to_status, updated_at=now)
+        if not updated:
+            raise TransitionConflict()
+        event = OrderEvent.objects.create(order=order, from_status=from_status, to_status=to_status, actor=actor)
+        # update() skips post_save, so publish to order streams explicitly.
+        if order_events_wanted():
+            transaction.on_commit(partial(publish_order_event, order.pk))
+        # Whether the customer may follow a rider depends on the status.
+        transaction.on_commit(partial(rider_locations.forget_orders, [order.pk]))
+
+    order.status = to_status
+    order.updated_at = now
+    return event
@@ -1,11 +1,90 @@
 # from django.shortcuts import render
+import json
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
+from .cache import get_menu
+from .exports import EXPORTS, FORMATS as EXPORT_FORMATS, stream_export
+from .geo import nearby
+from .hours import open_at_q
+from .pagination import CreatedAtCursorPagination
+from .payments import payment_pool
+from .quotes import price_cart
+from .readers import reader_for
+from .realtime import get_order_transport, order_broker
+from .rollups import restaurant_stats
+from .search import get_search_backend
+from .throttling import CoalescedReadMixin, TokenBucketThrottle
+from .tracking import location_flusher, order_tracking, parse_points, position_payload, rider_locations
 from .models import User, CustomerProfile, RestaurantProfile, RiderProfile, MenuItem, Order, Payment, Review, Subscription, Address
-from .serializers import UserSerializer, CustomerProfileSerializer, RestaurantProfileSerializer, RiderProfileSerializer, MenuItemSerializer, OrderSerializer, PaymentSerializer, ReviewSerializer, SubscriptionSerializer, AddressSerializer
+from .serializers import optimize_queryset, ExportQuerySerializer, NearbyQuerySerializer, OrderEventSerializer, QuoteRequestSerializer, SearchQuerySerializer, StatsQuerySerializer, UserSerializer, CustomerProfileSerializer, RestaurantProfileSerializer, RiderProfileSerializer, MenuItemSerializer, OrderSerializer, PaymentSerializer, ReviewSerializer, SubscriptionSerializer, AddressSerializer
+
+def search_response(view, request, method, filter_names):
+    backend = get_search_backend()
+    if backend is None:
+        return Response({'detail': 'Search is not available on this database.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    params = SearchQuerySerializer(data=request.query_params)
+    params.is_valid(raise_exception=True)
+    filters = {name: params.validated_data[name] for name in filter_names if name in params.validated_data}
+    ids = getattr(backend, method)(params.validated_data['q'], params.validated_data['limit'], **filters)
+    found = view.get_queryset().in_bulk(ids)
+    return Response(view.get_serializer([found[pk] for pk in ids if pk in found], many=True).data)
+
+class ValuesListMixin:
+    """
+    Serve GET lists through a ValuesReader compiled from the viewset's
+    serializer: rows come from .values() and are rendered without building
+    a model instance or serializer per row. The output is identical to the
+    serializer's. Set values_list = False to fall back to the serializer,
+    which is also used when the requested shape would make the reader load
+    relations row by row (see ValuesReader.loads_relations).
+    """
+    values_list = True
+
+    def list(self, request, *args, **kwargs):
+        if not self.values_list:
+            return super().list(request, *args, **kwargs)
+        serializer = self.get_serializer()
+        reader = reader_for(type(serializer), serializer.requested_fields, serializer.requested_expand)
+        if reader.loads_relations:
+            return super().list(request, *args, **kwargs)
+        lookups = list(reader.lookups)
+        # Cursor pagination reads its position from the row dicts.
+        ordering = getattr(self.paginator, 'ordering', ())
+        for field in (ordering,) if isinstance(ordering, str) else ordering:
+            if field.lstrip('-') not in lookups:
+                lookups.append(field.lstrip('-'))
+        rows = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*lookups)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.render(page))
+        return Response(reader.render(rows))
+
+class ExpandableQuerysetMixin:
+    """
+    Fit select_related/prefetch_related to what the serializer will render
+    for this request's ?fields= and ?expand=, so relations that are not
+    asked for cost no queries.
+    """
 
-class UserViewSet(viewsets.ModelViewSet):
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in permissions.SAFE_METHODS:
+            return queryset
+        return optimize_queryset(queryset, self.get_serializer())
+
+class UserViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -15,7 +94,7 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data)
 
-class CustomerProfileViewSet(viewsets.ModelViewSet):
+class CustomerProfileViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = CustomerProfile.objects.all()
     serializer_class = CustomerProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -23,17 +102,56 @@ class CustomerProfileViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user)
 
-class RestaurantProfileViewSet(viewsets.ModelViewSet):
-    queryset = RestaurantProfile.objects.all()
+class RestaurantProfileViewSet(ValuesListMixin, ExpandableQuerysetMixin, viewsets.ModelViewSet):
+    queryset = RestaurantProfile.objects.select_related('user', 'rating_summary')
     serializer_class = RestaurantProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         if self.request.user.user_type == 'restaurant_owner':
-            return self.queryset.filter(user=self.request.user)
-        return self.queryset.filter(is_active=True)
+            queryset = self.queryset.filter(user=self.request.user)
+        else:
+            queryset = self.queryset.filter(is_active=True)
+        if self.request.query_params.get('open_now') in ('1', 'true'):
+            queryset = queryset.filter(open_at_q())
+        return queryset
+
+    @action(detail=False, methods=['GET'])
+    def nearby(self, request):
+        params = NearbyQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        results = nearby(
+            self.get_queryset(),
+            params.validated_data['lat'],
+            params.validated_data['lng'],
+            params.validated_data['radius_km'],
+            params.validated_data['limit'],
+        )
+        data = []
+        for restaurant, distance in results:
+            row = self.get_serializer(restaurant).data
+            row['distance_km'] = round(distance, 3)
+            data.append(row)
+        return Response(data)
 
-class RiderProfileViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        return search_response(self, request, 'search_restaurants', ['cuisine_type'])
+
+    @action(detail=True, methods=['GET'])
+    def stats(self, request, pk=None):
+        restaurant = self.get_object()
+        if restaurant.user_id != request.user.pk:
+            raise PermissionDenied('Only the restaurant owner can view its stats.')
+        params = StatsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        start, end = (
+            timezone.make_aware(datetime.combine(day, time.min))
+            for day in (params.validated_data['start'], params.validated_data['end'] + timedelta(days=1))
+        )
+        return Response(restaurant_stats(restaurant.pk, params.validated_data['period'], start, end, params.validated_data['top']))
+
+class RiderProfileViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = RiderProfile.objects.all()
     serializer_class = RiderProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -43,10 +161,24 @@ class RiderProfileViewSet(viewsets.ModelViewSet):
             return self.queryset.filter(user=self.request.user)
         return self.queryset.none()
 
-class MenuItemViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['POST'])
+    def locations(self, request):
+        rider_id = rider_locations.rider_for_user(request.user.pk) if request.user.user_type == 'rider' else None
+        if rider_id is None:
+            raise PermissionDenied('Only riders can report locations.')
+        try:
+            points = parse_points(request.data)
+        except ValueError as exc:
+            raise ValidationError({'points': [str(exc)]})
+        accepted = rider_locations.add(rider_id, points)
+        location_flusher.notify()
+        return Response({'accepted': accepted, 'ignored': len(points) - accepted}, status=status.HTTP_202_ACCEPTED)
+
+class MenuItemViewSet(CoalescedReadMixin, ValuesListMixin, ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = MenuItem.objects.all()
     serializer_class = MenuItemSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    throttle_classes = [TokenBucketThrottle]
 
     def get_queryset(self):
         restaurant_id = self.request.query_params.get('restaurant_id')
@@ -54,49 +186,172 @@ class MenuItemViewSet(viewsets.ModelViewSet):
             return self.queryset.filter(restaurant_id=restaurant_id, is_available=True)
         return self.queryset.filter(is_available=True)
 
-class OrderViewSet(viewsets.ModelViewSet):
+    def list(self, request, *args, **kwargs):
+        restaurant_id = request.query_params.get('restaurant_id')
+        if not restaurant_id:
+            return super().list(request, *args, **kwargs)
+        if not restaurant_id.isdigit():
+            raise ValidationError({'restaurant_id': 'A valid integer is required.'})
+
+        # A single restaurant's menu is served whole from the menu cache.
+        # ?fields= is applied to the cached rows; ?expand= is not, as every
+        # item belongs to the restaurant the client asked for.
+        items, version = get_menu(int(restaurant_id))
+        fields = self.get_serializer().requested_fields
+        etag = f'menu-{restaurant_id}-{version}'
+        if fields:
+            items = [{name: item[name] for name in item if name in fields} for item in items]
+            etag += '-' + ','.join(fields)
+        etag = quote_etag(etag)
+        not_modified = get_conditional_response(request, etag=etag, last_modified=version)
+        response = not_modified or Response(items)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(version)
+        return response
+
+    @action(detail=False, methods=['GET'])
+    def search(self, request):
+        return search_response(self, request, 'search_menu_items', ['cuisine_type', 'category', 'min_price', 'max_price'])
+
+class OrderViewSet(ValuesListMixin, ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
+    pagination_class = CreatedAtCursorPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
         user = self.request.user
         if user.user_type == 'customer':
-            return self.queryset.filter(customer__user=user)
+            queryset = self.queryset.filter(customer__user=user)
         elif user.user_type == 'restaurant_owner':
-            return self.queryset.filter(restaurant__user=user)
+            queryset = self.queryset.filter(restaurant__user=user)
         elif user.user_type == 'rider':
-            return self.queryset.filter(rider__user=user)
-        return self.queryset.none()
+            queryset = self.queryset.filter(rider__user=user)
+        else:
+            return self.queryset.none()
+        # OrderSerializer renders customer/restaurant/rider as raw ids, so only
+        # the nested items need a second query; never one per order.
+        return queryset.prefetch_related('items')
 
     def perform_create(self, serializer):
-        serializer.save(customer=self.request.user.customer_profile)
+        serializer.save(customer=self.request.user.customers_profile)
+
+    @action(detail=False, methods=['POST'])
+    def batch(self, request):
+        serializer = self.get_serializer(data=request.data, many=True, max_length=settings.ORDER_BATCH_MAX_SIZE)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['POST'])
+    def quote(self, request):
+        params = QuoteRequestSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        return Response(price_cart(params.validated_data['items'], request.user.pk))
+
+    @action(detail=True, methods=['GET'])
+    def events(self, request, pk=None):
+        order = self.get_object()
+        events = order.events.order_by('created_at', 'id')
+        return Response(OrderEventSerializer(events, many=True).data)
+
+    @action(detail=True, methods=['GET'], url_path='rider-location')
+    def rider_location(self, request, pk=None):
+        # Answered from the in-memory tracking store instead of get_object(),
+        # so customers polling their order's map do not query the database.
+        # Only the current position is shared: the rider's retained trail
+        # also covers their previous deliveries.
+        tracking = order_tracking(int(pk)) if pk.isdigit() else None
+        if tracking is None or tracking[1] != request.user.pk:
+            raise NotFound()
+        rider_id = tracking[0]
+        latest = rider_locations.latest(rider_id) if rider_id else None
+        return Response({
+            'order': int(pk),
+            'rider': rider_id,
+            'position': position_payload(latest) if latest else None,
+        })
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
+    pagination_class = CreatedAtCursorPagination
     permission_classes = [permissions.IsAuthenticated]
+    # Status and transaction id are owned by the settlement worker.
+    http_method_names = ['get', 'post', 'head', 'options']
 
     def get_queryset(self):
         return self.queryset.filter(order__customer__user=self.request.user)
 
-class ReviewViewSet(viewsets.ModelViewSet):
+    def create(self, request, *args, **kwargs):
+        """
+        Record a pending payment and hand it to the worker pool; the response
+        never waits on the gateway. Repeating a request with the same
+        Idempotency-Key returns the original payment instead of a new one.
+        A failed payment may be retried with a new request; an order whose
+        payment is pending or completed gets 409.
+        """
+        key = request.headers.get('Idempotency-Key') or None
+        if key is not None and len(key) > 255:
+            raise ValidationError({'detail': 'Idempotency-Key must be at most 255 characters.'})
+        if key is not None:
+            existing = Payment.objects.filter(idempotency_key=key).first()
+            if existing is not None:
+                return self.replay(request, existing)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                payment = serializer.save(idempotency_key=key)
+        except IntegrityError:
+            # A concurrent request with the same key won the insert.
+            existing = key and Payment.objects.filter(idempotency_key=key).first()
+            if existing:
+                return self.replay(request, existing)
+            # Otherwise the order already has a live payment, or another
+            # request just started one.
+            return Response(
+                {'detail': 'This order already has a pending or completed payment.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        transaction.on_commit(partial(payment_pool.submit, payment.pk))
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+    def replay(self, request, payment):
+        same_customer = Payment.objects.filter(pk=payment.pk, order__customer__user=request.user).exists()
+        if not same_customer or str(request.data.get('order')) != str(payment.order_id):
+            return Response(
+                {'detail': 'Idempotency-Key was already used for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(self.get_serializer(payment).data)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+class ReviewViewSet(CoalescedReadMixin, ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
+    pagination_class = CreatedAtCursorPagination
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    throttle_classes = [TokenBucketThrottle]
 
     def perform_create(self, serializer):
-        serializer.save(customer=self.request.user.customer_profile)
+        serializer.save(customer=self.request.user.customers_profile)
 
-class SubscriptionViewSet(viewsets.ModelViewSet):
+class SubscriptionViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Subscription.objects.all()
     serializer_class = SubscriptionSerializer
+    pagination_class = CreatedAtCursorPagination
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return self.queryset.filter(customer__user=self.request.user)
+        return self.queryset.filter(customer__user=self.request.user).prefetch_related('items')
 
-class AddressViewSet(viewsets.ModelViewSet):
+    def perform_create(self, serializer):
+        serializer.save(customer=self.request.user.customers_profile)
+
+class AddressViewSet(ExpandableQuerysetMixin, viewsets.ModelViewSet):
     queryset = Address.objects.all()
     serializer_class = AddressSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -105,4 +360,64 @@ class AddressViewSet(viewsets.ModelViewSet):
         return self.queryset.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
\ No newline at end of file
+        serializer.save(user=self.request.user)
+
+async def order_stream(request):
+    """
+    Server-sent events for status changes on every order the user is party
+    to as customer, restaurant owner or rider. Only served under ASGI
+    (bukaflex.asgi), where each open stream costs a coroutine; a WSGI
+    worker would be held by the endless response, so it answers 501.
+    Events from other processes arrive through ORDER_STREAM_TRANSPORT.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({'detail': 'Order streams are only served by the ASGI application.'}, status=501)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+    get_order_transport().start()
+    subscription = order_broker.subscribe(user.pk)
+
+    async def events():
+        try:
+            yield f'retry: {settings.ORDER_STREAM_RETRY_MS}\n\n'
+            while True:
+                batch = await subscription.next_events(timeout=settings.ORDER_STREAM_KEEPALIVE)
+                if not batch:
+                    yield ': keepalive\n\n'
+                for event in batch:
+                    yield f"id: {event['id']}\nevent: order\ndata: {json.dumps(event)}\n\n"
+        finally:
+            order_broker.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+def export(request, name, fmt):
+    """
+    Stream an export (see core.exports) to staff as CSV or NDJSON, gzipped
+    on the fly when the client accepts it. Filters: start, end (inclusive
+    dates), status, restaurant_id.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+    if not request.user.is_staff:
+        return JsonResponse({'detail': 'You do not have permission to perform this action.'}, status=403)
+    if name not in EXPORTS or fmt not in EXPORT_FORMATS:
+        return JsonResponse({'detail': 'Not found.'}, status=404)
+    params = ExportQuerySerializer(data=request.GET)
+    if not params.is_valid():
+        return JsonResponse(params.errors, status=400)
+
+    compress = 'gzip' in request.headers.get('Accept-Encoding', '')
+    response = StreamingHttpResponse(stream_export(name, fmt, compress=compress, **params.validated_data),
+                                     content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+    if compress:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+